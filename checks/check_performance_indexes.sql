@@ -0,0 +1,67 @@
+-- Проверка, что часто выполняемые запросы приложения используют индексы
+-- из migration/18_10_2026_1_performance_indexes.sql и migration/18_10_2026_2_expert_combined.sql
+-- (psql -f checks/check_performance_indexes.sql).
+-- На маленьких таблицах планировщик обоснованно выбирает последовательное чтение,
+-- поэтому на время проверки оно запрещено: проверяется, что индекс подходит запросу.
+-- Ничего не изменяет; при ошибке перечисляет запросы без нужного индекса.
+
+BEGIN;
+SET LOCAL enable_seqscan = off;
+
+DO $$
+DECLARE
+    item record;
+    plan json;
+    failed text := '';
+BEGIN
+    FOR item IN
+        SELECT * FROM (VALUES
+            -- Коды ГРНТИ эксперта (карточка эксперта)
+            ('expert_grnti_pkey',
+             'SELECT rubric, subrubric, siscipline FROM expert_grnti WHERE id = 1'),
+            -- Удаление кодов эксперта
+            ('expert_grnti_pkey',
+             'DELETE FROM expert_grnti WHERE id = 1'),
+            -- Соединение в общей таблице
+            ('expert_grnti_pkey',
+             'SELECT e.name, eg.rubric FROM expert e LEFT JOIN expert_grnti eg ON e.id = eg.id WHERE e.id = 1'),
+            -- Поиск города по подстроке
+            ('reg_obl_city_city_trgm_idx',
+             'SELECT DISTINCT city, region, oblname FROM reg_obl_city WHERE city ILIKE ''%моск%'' ORDER BY city'),
+            -- Поиск эксперта по подстроке ФИО
+            ('expert_name_trgm_idx',
+             'SELECT id, name FROM expert WHERE name ILIKE ''%иван%'''),
+            -- Города региона
+            ('reg_obl_city_region_city_idx',
+             'SELECT DISTINCT city FROM reg_obl_city WHERE region = ''Центральный'' ORDER BY city'),
+            -- Общая таблица, отсортированная по ФИО
+            ('expert_name_idx',
+             'SELECT e.id, e.name, eg.rubric FROM expert e LEFT JOIN expert_grnti eg ON e.id = eg.id '
+             'ORDER BY e.name LIMIT 200'),
+            -- Первая страница экспертов, отсортированных по ФИО
+            ('expert_lower_name_idx',
+             'SELECT id, name FROM expert WHERE lower(name) IS NOT NULL ORDER BY lower(name), id LIMIT 201'),
+            -- Первая страница общей таблицы (18_10_2026_2_expert_combined.sql)
+            ('expert_combined_name_idx',
+             'SELECT * FROM expert_combined c WHERE lower(c.expert_name) IS NOT NULL '
+             'ORDER BY lower(c.expert_name), c.expert_id, COALESCE(c.grnti_code, -1) LIMIT 201'),
+            -- Пересчет строк эксперта триггерами
+            ('expert_combined_key_idx',
+             'DELETE FROM expert_combined WHERE expert_id = 1')
+        ) AS checks(index_name, query)
+    LOOP
+        EXECUTE 'EXPLAIN (FORMAT JSON) ' || item.query INTO plan;
+        IF position(format('"Index Name": "%s"', item.index_name) IN plan::text) > 0 THEN
+            RAISE NOTICE 'OK %: %', item.index_name, item.query;
+        ELSE
+            failed := failed || format(E'\n  %s: %s', item.index_name, item.query);
+        END IF;
+    END LOOP;
+
+    IF failed <> '' THEN
+        RAISE EXCEPTION 'Запросы не используют индексы:%', failed;
+    END IF;
+END
+$$;
+
+ROLLBACK;
@@ -0,0 +1,77 @@
+"""Проверка, что ключи строк из асинхронных страниц (asyncpg) подходят синхронным
+запросам изменения (psycopg2) и наоборот.
+
+Запуск из корня проекта: python checks/check_row_keys.py [таблица ...]
+Нужны asyncpg и настроенный config.py. Изменения откатываются.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+# Таблицы без первичного ключа: строка задается ctid
+TABLES = ['grnti_classifier', 'reg_obl_city']
+
+
+def check_table(db, async_db, loop, table_name):
+    """Возвращает список ошибок для таблицы"""
+    errors = []
+    schema = db.schema.get(table_name)
+    async_page = loop.run_until_complete(async_db.get_page(table_name, limit=5))
+    sync_page = db.get_page(table_name, limit=5)
+    if not async_page.rows:
+        return [f"{table_name}: таблица пуста"]
+
+    if async_page.row_keys != sync_page.row_keys:
+        errors.append(f"{table_name}: ключи строк различаются: {async_page.row_keys} и {sync_page.row_keys}")
+
+    # Страница, следующая за ключом другого менеджера
+    if sync_page.has_more:
+        next_async = loop.run_until_complete(async_db.get_page(table_name, sync_page.next_key, limit=5))
+        next_sync = db.get_page(table_name, async_page.next_key, limit=5)
+        if next_async.rows != next_sync.rows:
+            errors.append(f"{table_name}: следующие страницы различаются")
+
+    # Изменение и место строки по ключу из асинхронной страницы
+    row, row_key = async_page.rows[-1], async_page.row_keys[-1]
+    if db.get_row_position(table_name, row, row_key) is None:
+        errors.append(f"{table_name}: не найдено место строки {row_key}")
+    with db.get_cursor() as cursor:
+        try:
+            cursor.execute(schema.update_query, list(row[1:]) + list(row_key))
+            if cursor.fetchone() is None:
+                errors.append(f"{table_name}: строка {row_key} не найдена при изменении")
+        except Exception as e:
+            errors.append(f"{table_name}: изменение по ключу {row_key}: {e}")
+        finally:
+            cursor.connection.rollback()
+    return errors
+
+
+def main_check(tables):
+    if main.asyncpg is None:
+        print("asyncpg не установлен: проверять нечего")
+        return 0
+    db = main.DatabaseManager()
+    async_db = main.AsyncDatabaseManager(db)
+    loop = asyncio.new_event_loop()
+    errors = []
+    try:
+        for table_name in tables:
+            table_errors = check_table(db, async_db, loop, table_name)
+            print(f"{'OK' if not table_errors else 'ОШИБКА'} {table_name}")
+            errors.extend(table_errors)
+    finally:
+        async_db.close()
+        loop.close()
+        db.close()
+    for error in errors:
+        print(error)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_check(sys.argv[1:] or TABLES))
@@ -1,259 +1,2492 @@
+import asyncio
+import csv
+import io
+import itertools
+import json
+import math
+import os
+import re
 import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import pool
+from psycopg2.extras import execute_values
+try:
+    # Необязательные зависимости асинхронного режима
+    import asyncpg
+    import qasync
+except ImportError:
+    asyncpg = None
+    qasync = None
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTableWidgetItem,
                              QHeaderView, QMessageBox, QDialog, QVBoxLayout,
                              QLabel, QLineEdit, QDialogButtonBox, QHBoxLayout,
                              QPushButton, QTableWidget, QWidget, QScrollArea,
-                             QComboBox, QCompleter)
-from PyQt6.QtCore import Qt, QTimer
+                             QComboBox, QCompleter, QFileDialog, QInputDialog,
+                             QProgressDialog, QTreeWidget, QTreeWidgetItem, QTableView)
+from PyQt6.QtCore import (Qt, QTimer, QObject, QRunnable, QThreadPool, QSocketNotifier, pyqtSignal,
+                          QAbstractTableModel, QModelIndex)
+from PyQt6.QtGui import QIntValidator
 # from MainForm3 import Ui_MainWindow
+import config
 from config import DB_CONFIG
-from datetime import datetime
+from datetime import date, datetime
 from MainFormlayout import Ui_MainWindow
 
+# Параметры пула соединений (можно переопределить в config.py)
+DB_POOL_MIN_CONN = getattr(config, 'DB_POOL_MIN_CONN', 1)
+DB_POOL_MAX_CONN = getattr(config, 'DB_POOL_MAX_CONN', 5)
+DB_POOL_TIMEOUT = getattr(config, 'DB_POOL_TIMEOUT', 10)  # секунд ожидания свободного соединения
+DB_POOL_CHECK_INTERVAL = getattr(config, 'DB_POOL_CHECK_INTERVAL', 30)  # проверять соединение, если простаивало дольше
+FETCH_BATCH_SIZE = getattr(config, 'FETCH_BATCH_SIZE', 500)  # строк за одно чтение серверного курсора при выгрузке
+PAGE_SIZE = getattr(config, 'PAGE_SIZE', 200)  # строк на одной странице табличного представления
+IMPORT_BATCH_SIZE = getattr(config, 'IMPORT_BATCH_SIZE', 5000)  # строк в одной порции COPY при импорте
+USE_ASYNC_DB = getattr(config, 'USE_ASYNC_DB', True)  # читать данные через asyncpg, если он установлен
+DB_STATEMENT_TIMEOUT = getattr(config, 'DB_STATEMENT_TIMEOUT', 30)  # секунд на запрос чтения (0 - без ограничения)
+RESULT_CACHE_SIZE = getattr(config, 'RESULT_CACHE_SIZE', 64)  # МБ под кэш результатов запросов (0 - без кэша)
+LISTEN_CHANGES = getattr(config, 'LISTEN_CHANGES', True)  # обновлять открытую таблицу по уведомлениям сервера
+SERVER_DISPLAY_DATES = getattr(config, 'SERVER_DISPLAY_DATES', True)  # даты общей таблицы форматирует сервер
+VERSIONS_COLLAPSE_INTERVAL = getattr(config, 'VERSIONS_COLLAPSE_INTERVAL', 300)  # секунд между переносами table_change
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Соединение, которое помнит подготовленные на сервере запросы"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+# Типы столбцов, которые сортируются как текст (без учета регистра)
+TEXT_TYPES = ('character varying', 'character', 'text')
+
+# Формат дат, которые сервер возвращает готовым текстом (to_char), - как в таблицах на экране
+DISPLAY_DATE_FORMAT = 'DD.MM.YYYY'
+
+# До скольких строк представление считается точно (COUNT); для больших выборок
+# в строке состояния показывается оценка планировщика
+EXACT_COUNT_LIMIT = 100000
+
+# По скольким загруженным строкам оценивается ширина столбцов (не зависит от размера таблицы)
+COLUMN_WIDTH_SAMPLE = 100
+
+
+def tid_block(tid):
+    """Номер блока из значения ctid - строки '(блок,смещение)'"""
+    return int(tid.strip('()').split(',')[0])
+
+
+class PageSource:
+    """Описание выборки для постраничного чтения: FROM, выражения столбцов и уникальный ключ строки"""
+
+    def __init__(self, from_clause, columns, column_exprs, key_exprs, text_columns=(), unsortable=(),
+                 display_dates=()):
+        self.from_clause = from_clause
+        self.columns = columns            # имена столбцов результата
+        self.column_exprs = column_exprs  # имя столбца -> SQL-выражение
+        self.key_exprs = key_exprs        # [(SQL-выражение, шаблон параметра)] уникального ключа строки
+        # Столбцы-даты, которые сервер возвращает готовым текстом ДД.ММ.ГГГГ (для представлений
+        # только для чтения); сортировка по ним идет по самой дате
+        self.display_dates = display_dates
+        self.select_list = ', '.join(
+            f"to_char({column_exprs[col]}, '{DISPLAY_DATE_FORMAT}') AS {col}" if col in display_dates
+            else f"{column_exprs[col]} AS {col}"
+            for col in columns
+        )
+        # Измененная строка в формате строк страницы и ее ключ (для INSERT/UPDATE/DELETE ... RETURNING)
+        self.returning = f"RETURNING {self.select_list}, {', '.join(expr for expr, _ in key_exprs)}"
+        # Порядок строк без явной сортировки: ((столбец, по возрастанию), ...);
+        # пустой порядок - порядок самого ключа строки
+        self.default_order = ((columns[0], True),)
+
+        # Выражения сортировки: текст сравнивается без учета регистра;
+        # столбцов из unsortable здесь нет, по ним сортировать нельзя
+        self.sort_exprs = {}
+        for col in columns:
+            if col in unsortable:
+                continue
+            if col in text_columns:
+                self.sort_exprs[col] = (f"lower({column_exprs[col]})", 'lower(%s)')
+            elif col in display_dates:
+                # В ключе страницы дата записана текстом из строки результата
+                self.sort_exprs[col] = (column_exprs[col], f"to_date(%s, '{DISPLAY_DATE_FORMAT}')")
+            else:
+                self.sort_exprs[col] = (column_exprs[col], '%s')
+
+    def split_row(self, row):
+        """Делит строку выборки с ключевыми столбцами в конце на строку результата и ее ключ"""
+        column_count = len(self.columns)
+        return tuple(row[:column_count]), tuple(row[column_count:])
+
+    def order_terms(self, order):
+        """Выражения полного порядка строк order: [(SQL-выражение, шаблон параметра, по возрастанию)].
+
+        После столбцов order идут столбцы ключа, которых среди них нет; они упорядочены
+        в направлении последнего столбца, так что при сортировке по одному столбцу
+        вся строка сравнивается одним сравнением строк.
+        """
+        terms = [self.sort_exprs[column] + (ascending,) for column, ascending in order]
+        used = {self.column_exprs[column] for column, _ in order}
+        key_ascending = order[-1][1] if order else True
+        terms.extend((expr, template, key_ascending) for expr, template in self.key_exprs if expr not in used)
+        return terms
+
+    def seek_key(self, order, row, row_key):
+        """Ключ keyset-пагинации (как next_key) строки row с ключом row_key: значения order_terms(order)"""
+        used = {self.column_exprs[column] for column, _ in order}
+        key_values = [value for (expr, _), value in zip(self.key_exprs, row_key) if expr not in used]
+        return tuple([row[self.columns.index(column)] for column, _ in order] + key_values)
+
+    def preceding_conditions(self, order, seek_key, reverse=False):
+        """Условия на строки, которые в порядке order идут раньше строки с ключом seek_key
+        (при reverse - позже нее).
+
+        Возвращает [(SQL-условие, параметры)]; условия не пересекаются. При сортировке
+        по одному столбцу каждое, как сегменты plan_page, сводится к сравнению строк,
+        которое использует индекс; при нескольких столбцах условие строится по ним по очереди.
+        """
+        if len(order) > 1:
+            return self.lexicographic_conditions(order, seek_key, reverse)
+        if not order:
+            left = ', '.join(expr for expr, _ in self.key_exprs)
+            right = ', '.join(template for _, template in self.key_exprs)
+            return [(f"({left}) {'>' if reverse else '<'} ({right})", list(seek_key))]
+        column, ascending = order[0]
+        ascending = ascending != reverse
+        column_expr = self.column_exprs[column]
+        sort_expr, sort_template = self.sort_exprs[column]
+        keys = [key for key in self.key_exprs if key[0] != column_expr]
+        operator = '<' if ascending else '>'
+
+        # Пустые значения наименьшие: по возрастанию сегмент NULL идет первым
+        conditions = []
+        if seek_key[0] is None:
+            if not ascending:
+                conditions.append((f"{sort_expr} IS NOT NULL", []))
+            seek = keys
+            seek_values = list(seek_key[1:])
+            segment = f"{sort_expr} IS NULL"
+        else:
+            if ascending:
+                conditions.append((f"{sort_expr} IS NULL", []))
+            seek = [(sort_expr, sort_template)] + keys
+            seek_values = list(seek_key)
+            segment = f"{sort_expr} IS NOT NULL"
+        if seek:
+            left = ', '.join(expr for expr, _ in seek)
+            right = ', '.join(template for _, template in seek)
+            conditions.append((f"{segment} AND ({left}) {operator} ({right})", seek_values))
+        return conditions
+
+    def lexicographic_conditions(self, order, seek_key, reverse=False):
+        """preceding_conditions для нескольких столбцов: направления могут различаться,
+        поэтому вместо сравнения строк - условие на каждый столбец при равенстве предыдущих"""
+        conditions = []
+        equal, equal_params = [], []
+        for (expr, template, ascending), value in zip(self.order_terms(order), seek_key):
+            ascending = ascending != reverse
+            # Пустые значения наименьшие: раньше NULL по возрастанию нет ничего
+            if value is None:
+                before, params = (None if ascending else f"{expr} IS NOT NULL"), []
+            elif ascending:
+                before, params = f"({expr} IS NULL OR {expr} < {template})", [value]
+            else:
+                before, params = f"{expr} > {template}", [value]
+            if before is not None:
+                conditions.append((' AND '.join(equal + [before]), equal_params + params))
+            if value is None:
+                equal.append(f"{expr} IS NULL")
+            else:
+                equal.append(f"{expr} = {template}")
+                equal_params = equal_params + [value]
+        return conditions
+
+
+class ResultPage:
+    """Страница результата: строки, их ключи и ключ, с которого начинается следующая страница"""
+
+    def __init__(self, rows, next_key, row_keys=None):
+        self.rows = rows
+        self.next_key = next_key  # None, если это последняя страница
+        self.row_keys = row_keys  # значения ключа (PageSource.key_exprs) каждой строки
+
+    @property
+    def has_more(self):
+        return self.next_key is not None
+
+
+class PageQuery:
+    """Запросы одной страницы (по одному на сегмент сортировки) и сборка ResultPage из их строк"""
+
+    def __init__(self, source, order, limit, queries, prepare=None):
+        self.source = source
+        self.order = order
+        self.limit = limit
+        self.queries = queries  # (SQL, параметры) по порядку; последним параметром передается LIMIT
+        # Необязательный (SQL, параметры) запрос одного значения, от которого зависят запросы
+        # страницы; тогда queries - функция этого значения. Выполняется в том же соединении
+        self.prepare = prepare
+
+    def bind(self, value):
+        """Запросы страницы по результату prepare"""
+        return self.queries(value) if self.prepare is not None else self.queries
+
+    def remaining(self, rows):
+        """LIMIT для очередного сегмента: одна лишняя строка показывает, что страница не последняя"""
+        return self.limit + 1 - len(rows)
+
+    def is_full(self, rows):
+        return len(rows) > self.limit
+
+    def make_page(self, rows):
+        """Отрезает служебные столбцы ключа и вычисляет next_key"""
+        column_count = len(self.source.columns)
+        next_key = None
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            last = rows[-1]
+            next_key = self.source.seek_key(self.order, last, last[column_count:])
+        return ResultPage([tuple(row[:column_count]) for row in rows], next_key,
+                          [tuple(row[column_count:]) for row in rows])
+
+
+def format_value(value):
+    """Текст ячейки: пустое значение - пустая строка"""
+    return "" if value is None else str(value)
+
+
+def format_date_value(value):
+    """Текст ячейки столбца типа date в формате ДД.ММ.ГГГГ"""
+    return "" if value is None else value.strftime('%d.%m.%Y')
+
+
+# Сколько разных значений столбца запоминает memoize_formatter
+FORMAT_MEMO_SIZE = 10000
+
+
+def memoize_formatter(formatter, max_size=FORMAT_MEMO_SIZE):
+    """formatter, который форматирует каждое значение один раз: даты и числа в столбце повторяются,
+    и работа зависит от числа разных значений, а не ячеек"""
+    texts = {}
+
+    def format_memoized(value):
+        text = texts.get(value)
+        if text is None:
+            text = formatter(value)
+            if len(texts) < max_size:
+                texts[value] = text
+        return text
+    return format_memoized
+
+
+class ColumnInfo:
+    """Описание столбца по данным каталога.
+
+    По типу один раз выбирается, как значения столбца показываются (formatter),
+    сравниваются при сортировке (is_text - без учета регистра) и вводятся (EditDialog).
+    """
+
+    def __init__(self, name, data_type, nullable=True, primary_key=False, foreign_key=None, max_length=None,
+                 has_default=False):
+        self.name = name
+        self.data_type = data_type      # data_type из information_schema
+        self.nullable = nullable
+        self.has_default = has_default  # есть значение по умолчанию (например, serial)
+        self.primary_key = primary_key  # входит в первичный ключ
+        self.foreign_key = foreign_key  # (таблица, столбец), на которые ссылается столбец, или None
+        self.max_length = max_length    # character_maximum_length или None
+        self.is_date = data_type == 'date'
+        self.is_text = data_type in TEXT_TYPES
+        self.integer_range = INTEGER_RANGES.get(data_type)
+        self.formatter = format_date_value if self.is_date else format_value
+
+
+class TableSchema:
+    """Метаданные таблицы и SQL-запросы, построенные по ним один раз"""
+
+    def __init__(self, name, columns, types, primary_key, unique_keys, max_lengths=None, foreign_keys=None,
+                 pages=0, rows_per_page=0, nullable=None, defaults=None):
+        self.name = name
+        self.columns = columns            # имена столбцов в порядке ordinal_position
+        self.types = types                # столбец -> data_type из information_schema
+        self.primary_key = primary_key    # список столбцов первичного ключа (может быть пустым)
+        self.unique_keys = unique_keys    # списки столбцов UNIQUE-ограничений
+        self.max_lengths = max_lengths or {}    # столбец -> character_maximum_length
+        self.foreign_keys = foreign_keys or {}  # столбец -> (таблица, столбец), на которые он ссылается
+        nullable = nullable or {}
+        defaults = defaults or {}
+        self.column_info = {
+            col: ColumnInfo(col, types[col], nullable.get(col, True), col in primary_key,
+                            self.foreign_keys.get(col), self.max_lengths.get(col), defaults.get(col, False))
+            for col in columns
+        }
+        # Статистика pg_class на момент загрузки каталога: число блоков и строк в блоке
+        self.pages = pages
+        self.rows_per_page = rows_per_page
+
+        columns_str = ', '.join(columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        set_clause = ', '.join([f"{col} = %s" for col in columns[1:]])
+
+        # Для keyset-пагинации строку однозначно задает первичный ключ,
+        # а в таблицах без него - физический адрес строки ctid
+        if primary_key:
+            key_exprs = [(f't.{col}', '%s') for col in primary_key]
+        else:
+            key_exprs = [('t.ctid', '%s::tid')]
+        self.page_source = PageSource(
+            f'"{name}" t',
+            columns,
+            {col: f't.{col}' for col in columns},
+            key_exprs,
+            [col for col in columns if self.column_info[col].is_text]
+        )
+        if not primary_key:
+            # Без первичного ключа строки по умолчанию идут в физическом порядке (по ctid):
+            # сортировка по первому столбцу потребовала бы сортировать всю таблицу на каждой странице
+            self.page_source.default_order = ()
+
+        # Запись изменяется по тому же ключу строки (первичному ключу или ctid), который
+        # хранится для каждой показанной строки; запросы изменения возвращают строку
+        # так, как ее показывает постраничный просмотр
+        row_condition = ' AND '.join(f"{expr} = {template}" for expr, template in key_exprs)
+        returning = self.page_source.returning
+        self.insert_query = f"INSERT INTO {name} AS t ({columns_str}) VALUES ({placeholders}) {returning}"
+        self.update_query = f"UPDATE {name} t SET {set_clause} WHERE {row_condition} {returning}"
+        self.delete_query = f"DELETE FROM {name} t WHERE {row_condition} {returning}"
+
+
+class SchemaRegistry:
+    """Кэш метаданных таблиц: загружается из каталога один раз, сбрасывается явно"""
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Читает столбцы, ключи и размеры всех таблиц схемы четырьмя запросами к каталогу"""
+        with self.db_manager.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT table_name, column_name, data_type, character_maximum_length, is_nullable = 'YES',
+                       column_default IS NOT NULL
+                FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                ORDER BY table_name, ordinal_position
+            """)
+            column_rows = cursor.fetchall()
+
+            cursor.execute("""
+                SELECT tc.table_name, tc.constraint_name, tc.constraint_type, kcu.column_name
+                FROM information_schema.table_constraints tc
+                JOIN information_schema.key_column_usage kcu
+                  ON kcu.constraint_schema = tc.constraint_schema
+                 AND kcu.constraint_name = tc.constraint_name
+                 AND kcu.table_name = tc.table_name
+                WHERE tc.table_schema = current_schema()
+                  AND tc.constraint_type IN ('PRIMARY KEY', 'UNIQUE')
+                ORDER BY tc.table_name, tc.constraint_name, kcu.ordinal_position
+            """)
+            key_rows = cursor.fetchall()
+
+            # Внешние ключи из одного столбца
+            cursor.execute("""
+                SELECT cl.relname, a.attname, rcl.relname, ra.attname
+                FROM pg_constraint c
+                JOIN pg_class cl ON cl.oid = c.conrelid
+                JOIN pg_class rcl ON rcl.oid = c.confrelid
+                JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+                JOIN pg_attribute ra ON ra.attrelid = c.confrelid AND ra.attnum = c.confkey[1]
+                WHERE c.contype = 'f'
+                  AND cardinality(c.conkey) = 1
+                  AND cl.relnamespace = current_schema()::regnamespace
+            """)
+            foreign_key_rows = cursor.fetchall()
+
+            # Размер таблиц (для постраничного чтения в физическом порядке)
+            cursor.execute("""
+                SELECT relname, relpages, reltuples
+                FROM pg_class
+                WHERE relkind = 'r'
+                  AND relnamespace = current_schema()::regnamespace
+            """)
+            size_rows = cursor.fetchall()
+
+        columns = {}
+        types = {}
+        max_lengths = {}
+        nullable = {}
+        defaults = {}
+        for table_name, column_name, data_type, max_length, is_nullable, has_default in column_rows:
+            columns.setdefault(table_name, []).append(column_name)
+            types.setdefault(table_name, {})[column_name] = data_type
+            nullable.setdefault(table_name, {})[column_name] = is_nullable
+            defaults.setdefault(table_name, {})[column_name] = has_default
+            if max_length:
+                max_lengths.setdefault(table_name, {})[column_name] = max_length
+
+        foreign_keys = {}
+        for table_name, column_name, ref_table, ref_column in foreign_key_rows:
+            foreign_keys.setdefault(table_name, {})[column_name] = (ref_table, ref_column)
+
+        sizes = {table_name: (pages, tuples / pages if pages > 0 and tuples > 0 else 0)
+                 for table_name, pages, tuples in size_rows}
+
+        primary_keys = {}
+        unique_keys = {}
+        for table_name, constraint_name, constraint_type, column_name in key_rows:
+            if constraint_type == 'PRIMARY KEY':
+                primary_keys.setdefault(table_name, []).append(column_name)
+            else:
+                unique_keys.setdefault(table_name, {}).setdefault(constraint_name, []).append(column_name)
+
+        return {
+            table_name: TableSchema(
+                table_name,
+                table_columns,
+                types[table_name],
+                primary_keys.get(table_name, []),
+                list(unique_keys.get(table_name, {}).values()),
+                max_lengths.get(table_name),
+                foreign_keys.get(table_name),
+                *sizes.get(table_name, (0, 0)),
+                nullable.get(table_name),
+                defaults.get(table_name)
+            )
+            for table_name, table_columns in columns.items()
+        }
+
+    def get(self, table_name):
+        """Возвращает метаданные таблицы, при необходимости загружая каталог"""
+        with self._lock:
+            if self._tables is None or table_name not in self._tables:
+                # Таблица могла появиться после загрузки кэша - перечитываем каталог
+                self._tables = self._load()
+            if table_name not in self._tables:
+                raise KeyError(f"Таблица {table_name} не найдена")
+            return self._tables[table_name]
+
+    def has(self, table_name):
+        """Есть ли таблица в схеме (каталог при этом не перечитывается)"""
+        with self._lock:
+            if self._tables is None:
+                self._tables = self._load()
+            return table_name in self._tables
+
+    def invalidate(self):
+        """Сбрасывает кэш (например, после миграции схемы)"""
+        with self._lock:
+            self._tables = None
+
+
+def estimate_size(rows):
+    """Приблизительный объем памяти, занятый строками результата, в байтах"""
+    return sys.getsizeof(rows) + sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in rows
+    )
+
+
+class ResultCache:
+    """Кэш результатов запросов; при превышении объема вытесняются давно не использованные (LRU).
+
+    Запись хранит версии таблиц (table_version), из которых прочитан результат,
+    и действительна, пока эти версии не изменились.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # ключ -> (версии, результат, размер)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, versions):
+        """Результат для ключа, если он прочитан при тех же версиях таблиц, иначе None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != versions:
+                # Таблицы изменились - запись больше не понадобится
+                self._size -= self._entries.pop(key)[2]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, versions, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[2]
+            self._entries[key] = (versions, value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def discard(self, predicate):
+        """Удаляет записи, для ключей которых predicate(ключ) истинно"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._size -= self._entries.pop(key)[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+# Текущее число блоков таблицы (relpages в каталоге устаревает, пока не пройдет VACUUM/ANALYZE)
+RELATION_PAGES_QUERY = "SELECT pg_relation_size(%s::regclass) / current_setting('block_size')::int"
+
+# Версии таблиц, из которых читается представление (migration/18_10_2026_3_table_versions.sql):
+# перенесенные в table_version изменения и еще не перенесенные строки table_change
+TABLE_VERSIONS_QUERY = """
+    SELECT v.table_name, v.version + (SELECT count(*) FROM table_change c WHERE c.table_name = v.table_name)
+    FROM table_version v
+    WHERE v.table_name = ANY(%s)
+"""
+
+# Представления, которые читаются не из одноименной таблицы
+VIEW_TABLES = {
+    'combined': ('expert_combined',),
+    'combined_experts': ('expert', 'expert_grnti', 'grnti_classifier'),
+}
+
+# Исходные таблицы представлений: их изменение меняет представление
+VIEW_SOURCE_TABLES = {
+    'combined': ('expert', 'expert_grnti', 'grnti_classifier'),
+    'combined_experts': ('expert', 'expert_grnti', 'grnti_classifier'),
+}
+
+# Строки представлений, затронутые изменением исходной таблицы (уведомление table_changed):
+# столбцы представления, в которых лежат ключи из уведомления, и условие выборки этих строк.
+# Параметры условия - ключи (по массиву на каждый столбец, если столбцов несколько)
+CHANGED_ROW_FILTERS = {
+    'expert': {'expert': (['id'], "t.id = ANY(%s)")},
+    'expert_grnti': {'expert_grnti': (['id'], "t.id = ANY(%s)")},
+    'grnti_classifier': {'grnti_classifier': (['codrub'], "t.codrub = ANY(%s)")},
+    'reg_obl_city': {
+        'reg_obl_city': (['region', 'city'], "(t.region, t.city) IN (SELECT * FROM unnest(%s::text[], %s::text[]))"),
+    },
+    'combined': {
+        'expert': (['expert_id'], "c.expert_id = ANY(%s)"),
+        'expert_grnti': (['expert_id'], "c.expert_id = ANY(%s)"),
+        'grnti_classifier': (['grnti_code'], "c.grnti_code = ANY(%s)"),
+    },
+    'combined_experts': {
+        'expert': (['expert_id'], "e.id = ANY(%s)"),
+        'expert_grnti': (['expert_id'], "e.id = ANY(%s)"),
+        # Коды эксперта собраны в массив: строка затронута, если в нем есть измененная рубрика
+        'grnti_classifier': (['grnti_codes'], "e.id IN (SELECT eg.id FROM expert_grnti eg WHERE eg.rubric = ANY(%s))"),
+    },
+}
+
+# Больше измененных строк дешевле перечитать вместе со всей загруженной частью представления
+CHANGED_ROWS_LIMIT = 200
+
+
+# Объединенные данные эксперта, его кодов ГРНТИ и названий рубрик
+# Объединенная таблица хранится готовой в expert_combined и поддерживается триггерами
+# (migration/18_10_2026_2_expert_combined.sql), поэтому чтение не требует соединений
+COMBINED_COLUMNS = ['expert_id', 'expert_name', 'region', 'city', 'input_date',
+                    'grnti_code', 'grnti_description', 'subrubric', 'siscipline']
+
+# Выборка для постраничного чтения и выгрузки. Строку определяют эксперт и рубрика;
+# у эксперта без кодов ГРНТИ рубрики нет, она заменяется константой, чтобы ключ не содержал NULL
+COMBINED_PAGE_SOURCE = PageSource(
+    "expert_combined c",
+    COMBINED_COLUMNS,
+    {col: f"c.{col}" for col in COMBINED_COLUMNS},
+    [('c.expert_id', '%s'), ('COALESCE(c.grnti_code, -1)', '%s')],
+    ['expert_name', 'region', 'city', 'grnti_description'],
+    display_dates=['input_date'] if SERVER_DISPLAY_DATES else ()
+)
+
+# Компактная общая таблица: строка на эксперта, коды ГРНТИ собраны в массивы
+# (i-е элементы массивов относятся к одному коду). Массивы собираются только
+# для экспертов текущей страницы - подзапрос LATERAL выполняется после LIMIT
+COMPACT_COMBINED_CODE_COLUMNS = ['grnti_codes', 'grnti_descriptions', 'subrubrics', 'disciplines']
+
+COMPACT_COMBINED_PAGE_SOURCE = PageSource(
+    """expert e
+    LEFT JOIN LATERAL (
+        SELECT array_agg(eg.rubric ORDER BY eg.rubric) AS rubrics,
+               array_agg(gc.description ORDER BY eg.rubric) AS descriptions,
+               array_agg(eg.subrubric ORDER BY eg.rubric) AS subrubrics,
+               array_agg(eg.siscipline ORDER BY eg.rubric) AS disciplines
+        FROM expert_grnti eg
+        LEFT JOIN grnti_classifier gc ON eg.rubric = gc.codrub
+        WHERE eg.id = e.id
+    ) g ON true""",
+    ['expert_id', 'expert_name', 'region', 'city', 'input_date'] + COMPACT_COMBINED_CODE_COLUMNS,
+    {
+        'expert_id': 'e.id',
+        'expert_name': 'e.name',
+        'region': 'e.region',
+        'city': 'e.city',
+        'input_date': 'e.input_date',
+        'grnti_codes': 'g.rubrics',
+        'grnti_descriptions': 'g.descriptions',
+        'subrubrics': 'g.subrubrics',
+        'disciplines': 'g.disciplines',
+    },
+    [('e.id', '%s')],
+    ['expert_name', 'region', 'city'],
+    COMPACT_COMBINED_CODE_COLUMNS,
+    display_dates=['input_date'] if SERVER_DISPLAY_DATES else ()
+)
+
+# Из какой таблицы и столбца берется каждый столбец объединенной таблицы
+COMBINED_COLUMN_SOURCES = {
+    'expert_id': ('expert', 'id'),
+    'expert_name': ('expert', 'name'),
+    'region': ('expert', 'region'),
+    'city': ('expert', 'city'),
+    'input_date': ('expert', 'input_date'),
+    'grnti_code': ('expert_grnti', 'rubric'),
+    'grnti_description': ('grnti_classifier', 'description'),
+    'subrubric': ('expert_grnti', 'subrubric'),
+    'siscipline': ('expert_grnti', 'siscipline'),
+}
+
+# Часто выполняемые запросы, которые подготавливаются на сервере (PREPARE)
+# один раз на каждое соединение пула
+PREPARED_STATEMENTS = {
+    'cities_by_region': """
+        SELECT DISTINCT city FROM reg_obl_city WHERE region = $1 ORDER BY city
+    """,
+    'search_cities': """
+        SELECT DISTINCT city, region, oblname
+        FROM reg_obl_city
+        WHERE city ILIKE $1
+        ORDER BY city
+    """,
+}
+
+
+class QueryCancelled(Exception):
+    """Запрос отменен, потому что его результат больше не нужен"""
+
+
+class QueryCancel:
+    """Позволяет прервать запрос, который выполняется в другом потоке.
+
+    Пока запрос идет, к объекту привязано его соединение: cancel() отправляет
+    серверу запрос на отмену (pg_cancel_backend для этого соединения).
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def attach(self, connection):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled()
+            self._connection = connection
+
+    def detach(self):
+        # После отвязки соединение может вернуться в пул, отменять на нем уже нечего
+        with self._lock:
+            self._connection = None
+
+    def check(self):
+        if self.cancelled:
+            raise QueryCancelled()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._connection is not None and not self._connection.closed:
+                self._connection.cancel()
+
+
 class DatabaseManager:
     def __init__(self):
-        # Подключение к базе данных
+        # Пул соединений с базой данных
         try:
-            self.connection = psycopg2.connect(**DB_CONFIG)
+            self.pool = pool.ThreadedConnectionPool(DB_POOL_MIN_CONN, DB_POOL_MAX_CONN,
+                                                    connection_factory=PreparingConnection, **DB_CONFIG)
             print("Успешное подключение к базе данных!")
         except Exception as e:
             print(f"Ошибка подключения: {e}")
             raise
 
-    def get_table_data(self, table_name):
-        """Получить данные из конкретной таблицы"""
-        cursor = self.connection.cursor()
-        columns = self.get_columns_names(table_name)
-        cursor.execute(f'SELECT * FROM "{table_name}" ORDER BY {columns[0]}')
-        data = cursor.fetchall()
-        cursor.close()
-        return data
+        # Семафор ограничивает число одновременно выданных соединений:
+        # при исчерпании пула поток ждет, а не получает PoolError
+        self._slots = threading.BoundedSemaphore(DB_POOL_MAX_CONN)
+        self._last_used = {}  # id(соединения) -> время возврата в пул
+        self._lock = threading.Lock()
+
+        # Метаданные таблиц читаются из каталога один раз
+        self.schema = SchemaRegistry(self)
+
+        # Счетчик для уникальных имен серверных курсоров
+        self._cursor_counter = itertools.count(1)
+
+        # Кэш прочитанных страниц, актуальность проверяется по версиям таблиц
+        self.result_cache = ResultCache(RESULT_CACHE_SIZE * 1024 * 1024)
+
+        # Серверные процессы открытых соединений пула: свои изменения не нужно применять
+        # по уведомлениям. id(соединения) -> pid; закрытые соединения удаляются, иначе
+        # уведомления другого клиента, получившего тот же pid, считались бы своими
+        self._backend_pids = {}
+
+    def _is_alive(self, connection):
+        """Проверяет, что соединение из пула еще работоспособно"""
+        if connection.closed:
+            return False
+
+        with self._lock:
+            last_used = self._last_used.get(id(connection))
+        # Недавно использованные соединения не проверяем лишним запросом
+        if last_used is not None and time.monotonic() - last_used < DB_POOL_CHECK_INTERVAL:
+            return True
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _release(self, connection, close=False):
+        """Возвращает соединение в пул"""
+        with self._lock:
+            if close:
+                self._last_used.pop(id(connection), None)
+            else:
+                self._last_used[id(connection)] = time.monotonic()
+        self.pool.putconn(connection, close=close)
+        # Пул закрывает и исправные соединения сверх DB_POOL_MIN_CONN
+        if connection.closed:
+            with self._lock:
+                self._last_used.pop(id(connection), None)
+                self._backend_pids.pop(id(connection), None)
+
+    @contextmanager
+    def get_connection(self):
+        """Выдает соединение из пула и гарантированно возвращает его обратно"""
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise pool.PoolError("Нет свободных соединений с базой данных")
+
+        try:
+            connection = None
+            # Битые соединения закрываем и берем следующее
+            for _ in range(DB_POOL_MAX_CONN + 1):
+                connection = self.pool.getconn()
+                if self._is_alive(connection):
+                    break
+                self._release(connection, close=True)
+                connection = None
+            if connection is None:
+                raise psycopg2.OperationalError("Не удалось получить рабочее соединение с базой данных")
+            with self._lock:
+                self._backend_pids[id(connection)] = connection.info.backend_pid
+
+            try:
+                yield connection
+            finally:
+                # Незавершенная транзакция (в т.ч. после ошибки) не должна уходить обратно в пул
+                broken = bool(connection.closed)
+                if (not broken and connection.info.transaction_status
+                        != psycopg2.extensions.TRANSACTION_STATUS_IDLE):
+                    try:
+                        connection.rollback()
+                    except psycopg2.Error:
+                        broken = True
+                self._release(connection, close=broken)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def get_cursor(self, timeout=None, cancel=None):
+        """Курсор в отдельной транзакции: commit при успехе, rollback при ошибке.
+
+        timeout - ограничение времени каждого запроса в транзакции, сек;
+        cancel - QueryCancel, через который запрос можно прервать из другого потока.
+        """
+        with self.get_connection() as connection:
+            cursor = connection.cursor()
+            if cancel is not None:
+                cancel.attach(connection)
+            try:
+                if timeout:
+                    cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout * 1000),))
+                yield cursor
+                connection.commit()
+            except psycopg2.extensions.QueryCanceledError:
+                # Отмена по запросу пользователя - не ошибка, в отличие от statement_timeout
+                if cancel is not None and cancel.cancelled:
+                    raise QueryCancelled()
+                raise
+            finally:
+                if cancel is not None:
+                    cancel.detach()
+                cursor.close()
+
+    def iter_query(self, query, params=None, batch_size=None):
+        """Читает результат запроса пачками через серверный (именованный) курсор.
+
+        Соединение занято, пока генератор не исчерпан или не закрыт.
+        """
+        batch_size = batch_size or FETCH_BATCH_SIZE
+        with self.get_connection() as connection:
+            cursor = connection.cursor(name=f"stream_{next(self._cursor_counter)}")
+            cursor.itersize = batch_size
+            try:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                if not connection.closed:
+                    cursor.close()
+
+    def execute_prepared(self, cursor, name, params=()):
+        """Выполняет запрос из PREPARED_STATEMENTS, подготавливая его при первом вызове на соединении"""
+        connection = cursor.connection
+        if name not in connection.prepared:
+            cursor.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+            connection.prepared.add(name)
+
+        if params:
+            placeholders = ', '.join(['%s'] * len(params))
+            cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+        else:
+            cursor.execute(f"EXECUTE {name}")
+
+    def close(self):
+        """Закрывает все соединения пула"""
+        self.pool.closeall()
+        with self._lock:
+            self._backend_pids.clear()
+
+    def get_view_tables(self, table_name):
+        """Таблицы, из которых читается представление"""
+        return VIEW_TABLES.get(table_name, (table_name,))
+
+    def has_table_versions(self):
+        """Ведутся ли версии таблиц (применена ли миграция table_version)"""
+        return RESULT_CACHE_SIZE > 0 and self.schema.has('table_change')
+
+    def collapse_table_versions(self, cancel=None):
+        """Переносит накопленные строки table_change в счетчики table_version.
+
+        Выполняется при запуске и затем раз в VERSIONS_COLLAPSE_INTERVAL секунд: TABLE_VERSIONS_QUERY
+        считает еще не перенесенные строки перед каждым чтением страницы. Версии таблиц при этом
+        не меняются; изменяющие транзакции других пользователей не ждут. Если перенос уже
+        выполняет другое окно приложения, этот пропускается.
+        """
+        if not self.has_table_versions():
+            return
+        try:
+            with self.get_cursor(cancel=cancel) as cursor:
+                cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext('table_version_collapse'))")
+                if cursor.fetchone()[0]:
+                    cursor.execute("SELECT table_version_collapse()")
+        except Exception as e:
+            print(f"Ошибка переноса версий таблиц: {e}")
+
+    def make_table_versions(self, tables, rows):
+        """Версии таблиц в порядке tables по строкам TABLE_VERSIONS_QUERY; None, если версия какой-то не ведется"""
+        versions = dict(rows)
+        if any(table not in versions for table in tables):
+            return None
+        return tuple(versions[table] for table in tables)
+
+    def read_table_versions(self, cursor, tables):
+        """Читает версии таблиц одним небольшим запросом; None, если кэшировать нельзя"""
+        if not self.has_table_versions():
+            return None
+        cursor.execute(TABLE_VERSIONS_QUERY, (list(tables),))
+        return self.make_table_versions(tables, cursor.fetchall())
+
+    def get_view_sources(self, table_name):
+        """Исходные таблицы представления"""
+        return VIEW_SOURCE_TABLES.get(table_name, (table_name,))
+
+    def invalidate_cached(self, table_name):
+        """Удаляет из кэша результаты, зависящие от таблицы (например, по уведомлению об ее изменении)"""
+        self.result_cache.discard(lambda key: table_name in self.get_view_sources(key[1]))
+
+    def owns_backend(self, pid):
+        """Принадлежит ли серверный процесс pid соединению этого приложения"""
+        with self._lock:
+            return pid in self._backend_pids.values()
+
+    def get_page_source(self, table_name):
+        """Описание выборки таблицы (или 'combined', 'combined_experts') для постраничного чтения и выгрузки"""
+        if table_name == 'combined':
+            return COMBINED_PAGE_SOURCE
+        if table_name == 'combined_experts':
+            return COMPACT_COMBINED_PAGE_SOURCE
+        return self.schema.get(table_name).page_source
+
+    def get_column_info(self, table_name):
+        """Описания столбцов таблицы (или 'combined', 'combined_experts'): имя -> ColumnInfo"""
+        if table_name in ('combined', 'combined_experts'):
+            # Общую таблицу только показывают: важен тип исходного столбца.
+            # У массивов кодов ГРНТИ описаний нет
+            info = {}
+            for column in self.get_page_source(table_name).columns:
+                if column in COMBINED_COLUMN_SOURCES:
+                    source_table, source_column = COMBINED_COLUMN_SOURCES[column]
+                    source = self.schema.get(source_table).column_info[source_column]
+                    info[column] = ColumnInfo(column, source.data_type, max_length=source.max_length)
+            return info
+        return dict(self.schema.get(table_name).column_info)
+
+    def get_column_types(self, table_name):
+        """Типы столбцов таблицы (или 'combined') по данным каталога"""
+        return {column: info.data_type for column, info in self.get_column_info(table_name).items()}
+
+    def plan_page(self, table_name, after_key=None, limit=None, order=None):
+        """Строит запросы страницы keyset-пагинации (без OFFSET), не выполняя их.
+
+        table_name - имя таблицы, 'combined' для объединенной таблицы
+        или 'combined_experts' для нее же по строке на эксперта;
+        order - ((имя столбца, по возрастанию), ...), по умолчанию PageSource.default_order;
+        after_key - next_key предыдущей страницы или None для первой.
+        """
+        source = self.get_page_source(table_name)
+        limit = limit or PAGE_SIZE
+        order = tuple(order or source.default_order)
+        if not order:
+            return self.plan_physical_page(table_name, after_key, limit)
+        for column, _ in order:
+            if column not in source.sort_exprs:
+                raise ValueError(f"Неизвестный столбец для сортировки: {column}")
+        if len(order) > 1:
+            return self.plan_multi_column_page(source, order, after_key, limit)
+
+        column, ascending = order[0]
+        column_expr = source.column_exprs[column]
+        sort_expr, sort_template = source.sort_exprs[column]
+        # Если сортируем по самому ключу, он же и разрешает равенство значений
+        key_exprs = [key for key in source.key_exprs if key[0] != column_expr]
+        direction = 'ASC' if ascending else 'DESC'
+        operator = '>' if ascending else '<'
+
+        # Пустые значения считаются наименьшими: в начале при сортировке по возрастанию,
+        # в конце - по убыванию. Строки с NULL читаются отдельным сегментом:
+        # так условие поиска остается простым сравнением строк, которое использует индекс
+        nulls_first = ascending
+        segments = ['null', 'value'] if nulls_first else ['value', 'null']
+        if after_key is None:
+            start = 0
+        else:
+            start = segments.index('null' if after_key[0] is None else 'value')
+
+        key_columns = ', '.join(expr for expr, _ in source.key_exprs)
+        queries = []
+        for index in range(start, len(segments)):
+            if segments[index] == 'null':
+                conditions = [f"{sort_expr} IS NULL"]
+                seek = key_exprs
+                seek_values = list(after_key[1:]) if after_key else []
+            else:
+                conditions = [f"{sort_expr} IS NOT NULL"]
+                seek = [(sort_expr, sort_template)] + key_exprs
+                seek_values = list(after_key) if after_key else []
+
+            params = []
+            if after_key is not None and index == start and seek:
+                left = ', '.join(expr for expr, _ in seek)
+                right = ', '.join(template for _, template in seek)
+                conditions.append(f"({left}) {operator} ({right})")
+                params = seek_values
+
+            order_by = ', '.join(f"{expr} {direction}" for expr, _ in seek)
+            query = (f"SELECT {source.select_list}, {key_columns} FROM {source.from_clause} "
+                     f"WHERE {' AND '.join(conditions)} "
+                     f"{'ORDER BY ' + order_by if order_by else ''} "
+                     f"LIMIT %s")
+            queries.append((query, params))
+
+        return PageQuery(source, order, limit, queries)
+
+    def plan_multi_column_page(self, source, order, after_key, limit):
+        """Запрос страницы при сортировке по нескольким столбцам (Shift+клик по заголовкам).
+
+        Направления столбцов могут различаться, поэтому строки после after_key выбираются
+        условиями PageSource.preceding_conditions, а не одним сравнением строк.
+        """
+        key_columns = ', '.join(expr for expr, _ in source.key_exprs)
+        order_by = ', '.join(f"{expr} {'ASC NULLS FIRST' if ascending else 'DESC NULLS LAST'}"
+                             for expr, _, ascending in source.order_terms(order))
+        where, params = "", []
+        if after_key is not None:
+            after = source.preceding_conditions(order, after_key, reverse=True)
+            if not after:
+                return PageQuery(source, order, limit, [])
+            where = f"WHERE {' OR '.join(f'({condition})' for condition, _ in after)} "
+            params = [value for _, condition_params in after for value in condition_params]
+        query = (f"SELECT {source.select_list}, {key_columns} FROM {source.from_clause} "
+                 f"{where}ORDER BY {order_by} LIMIT %s")
+        return PageQuery(source, order, limit, [(query, params)])
+
+    def plan_physical_page(self, table_name, after_key, limit):
+        """Запросы страницы таблицы без первичного ключа в физическом порядке строк (по ctid).
+
+        ORDER BY ctid по всей таблице сортировал бы все ее строки, поэтому страница
+        читается диапазонами блоков (Tid Range Scan) и сортируются только строки диапазона.
+        Диапазон удваивается, пока страница не наполнится. Границей служит текущий размер
+        таблицы (prepare), а не статистика каталога: таблица могла вырасти после ее загрузки
+        или еще не пройти VACUUM. Последний запрос без верхней границы дочитывает только
+        блоки, добавленные после чтения размера.
+        """
+        schema = self.schema.get(table_name)
+        source = schema.page_source
+        select = f"SELECT {source.select_list}, t.ctid FROM {source.from_clause} WHERE "
+        block_start = "t.ctid >= %s::text::tid"
+
+        def queries(pages):
+            if after_key is None:
+                block, condition, params = 0, block_start, ['(0,0)']
+            else:
+                block, condition, params = tid_block(after_key[0]), "t.ctid > %s::tid", [after_key[0]]
+            # Первый диапазон - примерно на страницу строк
+            size = max(1, math.ceil((limit + 1) / schema.rows_per_page)) if schema.rows_per_page else 1
+            while block < pages:
+                upper = block + size
+                yield (f"{select}{condition} AND t.ctid < %s::text::tid ORDER BY t.ctid LIMIT %s",
+                       params + [f'({upper},0)'])
+                block, condition, params = upper, block_start, [f'({upper},0)']
+                size *= 2
+            yield f"{select}{condition} ORDER BY t.ctid LIMIT %s", params
+
+        return PageQuery(source, (), limit, queries, prepare=(RELATION_PAGES_QUERY, [f'"{table_name}"']))
+
+    def get_page(self, table_name, after_key=None, limit=None, order=None, cancel=None):
+        """Получить страницу строк, следующих за after_key (см. plan_page).
+
+        Запросы ограничены DB_STATEMENT_TIMEOUT; cancel - необязательный QueryCancel.
+        """
+        plan = self.plan_page(table_name, after_key, limit, order)
+        key = ('page', table_name, after_key, plan.limit, plan.order)
+        rows = []
+        with self.get_cursor(timeout=DB_STATEMENT_TIMEOUT, cancel=cancel) as cursor:
+            # Повторный показ неизмененной таблицы берется из кэша после проверки версий
+            versions = self.read_table_versions(cursor, self.get_view_tables(table_name))
+            if versions is not None:
+                page = self.result_cache.get(key, versions)
+                if page is not None:
+                    return page
+
+            queries = plan.queries
+            if plan.prepare is not None:
+                cursor.execute(*plan.prepare)
+                queries = plan.bind(cursor.fetchone()[0])
+            for query, params in queries:
+                if cancel is not None:
+                    cancel.check()
+                cursor.execute(query, params + [plan.remaining(rows)])
+                rows.extend(cursor.fetchall())
+                if plan.is_full(rows):
+                    break
+        page = plan.make_page(rows)
+        if versions is not None:
+            self.result_cache.put(key, versions, page, estimate_size(page.rows))
+        return page
+
+    def count_rows(self, table_name, cancel=None):
+        """Число строк представления для строки состояния: (число, точное ли оно).
+
+        Сначала берется оценка планировщика (EXPLAIN, без чтения данных); выборки
+        меньше EXACT_COUNT_LIMIT строк считаются точно, COUNT останавливается на этом пределе.
+        """
+        source = self.get_page_source(table_name)
+        with self.get_cursor(timeout=DB_STATEMENT_TIMEOUT, cancel=cancel) as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {source.from_clause}")
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+            if estimate >= EXACT_COUNT_LIMIT:
+                return estimate, False
+
+            cursor.execute(f"SELECT count(*) FROM (SELECT 1 FROM {source.from_clause} LIMIT %s) counted",
+                           (EXACT_COUNT_LIMIT + 1,))
+            count = cursor.fetchone()[0]
+            if count > EXACT_COUNT_LIMIT:
+                return max(estimate, count), False
+            return count, True
 
     def get_columns_names(self, table_name):
         """Получить названия столбцов таблицы"""
-        cursor = self.connection.cursor()
-        cursor.execute(f"""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = '{table_name}'
-            ORDER BY ordinal_position
-        """)
-        columns = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        return columns
+        return list(self.schema.get(table_name).columns)
+
+    def fetch_changed_row(self, cursor, table_name):
+        """Строка, возвращенная RETURNING запроса изменения, и ее ключ; (None, None), если строк нет"""
+        row = cursor.fetchone()
+        if row is None:
+            return None, None
+        return self.get_page_source(table_name).split_row(row)
 
     def insert_record(self, table_name, data):
-        """Добавить новую запись в таблицу"""
-        cursor = self.connection.cursor()
-        columns = self.get_columns_names(table_name)
+        """Добавить новую запись в таблицу.
 
-        # Формируем SQL запрос
-        placeholders = ', '.join(['%s'] * len(data)) # Создание строки с плейсхолдерами (метка для динамической вставки данных) для параметров
-        columns_str = ', '.join(columns)
+        Возвращает добавленную строку в формате get_page и ее ключ.
+        """
+        schema = self.schema.get(table_name)
+        with self.get_cursor() as cursor:
+            cursor.execute(schema.insert_query, data)
+            return self.fetch_changed_row(cursor, table_name)
 
-        query = f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})"
-
-        cursor.execute(query, data)
-        self.connection.commit()
-        cursor.close()
-
-    def update_record(self, table_name, record_id, data):
-        """Обновить запись в таблице"""
-        cursor = self.connection.cursor()
-        columns = self.get_columns_names(table_name)
-
-        # Формируем SQL запрос
-        set_clause = ', '.join([f"{col} = %s" for col in columns[1:]]) #Пропускаем первый столбец (ID), column1 = %s, column2 = %s...
-        query = f"UPDATE {table_name} SET {set_clause} WHERE {columns[0]} = %s"
-
-        # Добавляем ID в конец данных для условия WHERE
-        data_with_id = data + [record_id]
-
-        cursor.execute(query, data_with_id)
-        self.connection.commit()
-        cursor.close()
-
-    def delete_record(self, table_name, record_id):
-        """Удалить запись из таблицы"""
-        cursor = self.connection.cursor()
-        columns = self.get_columns_names(table_name)
-
-        query = f"DELETE FROM {table_name} WHERE {columns[0]} = %s"
-
-        cursor.execute(query, (record_id,))
-        self.connection.commit()
-        cursor.close()
-
-    def get_combined_data(self):
-        """Получить объединенные данные из всех таблиц"""
-        cursor = self.connection.cursor()
-        
-        # SQL запрос для объединения данных
-        query = """
-        SELECT 
-            e.id as expert_id,
-            e.name as expert_name,
-            e.region,
-            e.city,
-            e.input_date,
-            eg.rubric as grnti_code,
-            gc.description as grnti_description,
-            eg.subrubric,
-            eg.siscipline
-        FROM expert e
-        LEFT JOIN expert_grnti eg ON e.id = eg.id
-        LEFT JOIN grnti_classifier gc ON eg.rubric = gc.codrub
-        ORDER BY e.name
+    def update_record(self, table_name, row_key, data):
+        """Обновить запись в таблице.
+
+        row_key - ключ строки из ResultPage.row_keys; data - значения столбцов, кроме первого.
+        Возвращает измененную строку и ее новый ключ ((None, None), если записи уже нет).
         """
-        
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        return data
+        schema = self.schema.get(table_name)
+
+        # Добавляем ключ строки в конец данных для условия WHERE
+        data_with_key = list(data) + list(row_key)
+
+        with self.get_cursor() as cursor:
+            cursor.execute(schema.update_query, data_with_key)
+            return self.fetch_changed_row(cursor, table_name)
+
+    def delete_record(self, table_name, row_key):
+        """Удалить запись с ключом строки row_key. Возвращает удаленную строку и ее ключ"""
+        schema = self.schema.get(table_name)
+        with self.get_cursor() as cursor:
+            cursor.execute(schema.delete_query, list(row_key))
+            return self.fetch_changed_row(cursor, table_name)
+
+    def get_row_position(self, table_name, row, row_key, order=None, limit=None, next_key=None, cancel=None):
+        """Место строки row (с ключом row_key) среди загруженных строк представления.
+
+        Загружены первые limit строк в порядке order (см. plan_page) - до строки next_key
+        включительно или все, если next_key равен None. Возвращает, сколько загруженных
+        строк идет перед row, или None, если row идет после next_key и придет со следующей страницей.
+        Строки считаются по индексу и не дальше limit, без полного подсчета.
+        """
+        source = self.get_page_source(table_name)
+        limit = PAGE_SIZE if limit is None else limit
+        order = tuple(order or source.default_order)
+        with self.get_cursor(timeout=DB_STATEMENT_TIMEOUT, cancel=cancel) as cursor:
+            if next_key is not None:
+                # Идет ли строка после next_key: "раньше" в обратном порядке
+                key_condition = ' AND '.join(f"{expr} = {template}" for expr, template in source.key_exprs)
+                after = source.preceding_conditions(order, next_key, reverse=True)
+                cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {source.from_clause} WHERE {key_condition} "
+                               f"AND ({' OR '.join(f'({condition})' for condition, _ in after)}))",
+                               list(row_key) + [value for _, params in after for value in params])
+                if cursor.fetchone()[0]:
+                    return None
+
+            position = 0
+            for condition, params in source.preceding_conditions(order, source.seek_key(order, row, row_key)):
+                cursor.execute(f"SELECT count(*) FROM (SELECT 1 FROM {source.from_clause} "
+                               f"WHERE {condition} LIMIT %s) preceding", params + [limit - position])
+                position += cursor.fetchone()[0]
+        return position
+
+    def locate_changed_rows(self, table_name, changes, order=None, limit=None, next_key=None, cancel=None):
+        """Перечитывает строки представления, затронутые изменениями исходных таблиц, и находит их места.
+
+        changes - {исходная таблица: множество ключей из уведомлений} (см. CHANGED_ROW_FILTERS);
+        order, limit, next_key - загруженные строки, как в get_row_position.
+        Возвращает [(место, строка, ключ строки)] по возрастанию места без строк, которые
+        придут со следующими страницами, или None, если строк больше CHANGED_ROWS_LIMIT.
+        """
+        source = self.get_page_source(table_name)
+        key_count = len(source.key_exprs)
+        key_columns = ', '.join(expr for expr, _ in source.key_exprs)
+        rows = {}
+        with self.get_cursor(timeout=DB_STATEMENT_TIMEOUT, cancel=cancel) as cursor:
+            for table, keys in changes.items():
+                columns, condition = CHANGED_ROW_FILTERS[table_name][table]
+                if len(columns) == 1:
+                    params = [list(keys)]
+                else:
+                    params = [list(values) for values in zip(*keys)]
+                cursor.execute(f"SELECT {source.select_list}, {key_columns} FROM {source.from_clause} "
+                               f"WHERE {condition} LIMIT %s", params + [CHANGED_ROWS_LIMIT + 1])
+                for row in cursor.fetchall():
+                    rows[tuple(row[-key_count:])] = tuple(row[:-key_count])
+                if len(rows) > CHANGED_ROWS_LIMIT:
+                    return None
+
+        # Перечитанные строки тоже могут идти друг перед другом: место считается с их запасом
+        limit = (PAGE_SIZE if limit is None else limit) + len(rows)
+        located = []
+        for row_key, row in rows.items():
+            position = self.get_row_position(table_name, row, row_key, order, limit=limit,
+                                             next_key=next_key, cancel=cancel)
+            if position is not None:
+                located.append((position, row, row_key))
+        located.sort(key=lambda item: item[0])
+        return located
 
     def get_combined_columns(self):
         """Получить названия столбцов для объединенной таблицы"""
-        return [
-            'expert_id', 'expert_name', 'region', 'city', 'input_date',
-            'grnti_code', 'grnti_description', 'subrubric', 'siscipline'
-        ]
+        return list(COMBINED_COLUMNS)
 
     def insert_expert_with_grnti(self, expert_data, grnti_codes):
-        """Добавить эксперта с кодами ГРНТИ"""
-        cursor = self.connection.cursor()
-        
-        try:
-            # Вставляем эксперта
-            expert_query = """
-                INSERT INTO expert (name, region, city, keywords, group_count, input_date) 
-                VALUES (%s, %s, %s, %s, %s, %s) 
-                RETURNING id
-            """
-            
-            # Форматируем дату для базы данных
-            date_str = expert_data[5]  # Дата добавления
-            if date_str:
-                db_date = DateValidator.format_date_for_db(date_str)
-                if db_date:
-                    expert_data[5] = db_date
-                else:
-                    expert_data[5] = datetime.now().strftime('%Y-%m-%d')
+        """Добавить эксперта с кодами ГРНТИ.
+
+        Возвращает строку эксперта в формате get_page('expert') и ее ключ.
+        """
+        # Вставляем эксперта
+        expert_query = f"""
+            INSERT INTO expert AS t (name, region, city, keywords, group_count, input_date) 
+            VALUES (%s, %s, %s, %s, %s, %s) 
+            {self.get_page_source('expert').returning}
+        """
+
+        # Форматируем дату для базы данных
+        date_str = expert_data[5]  # Дата добавления
+        if date_str:
+            db_date = DateValidator.format_date_for_db(date_str)
+            if db_date:
+                expert_data[5] = db_date
             else:
                 expert_data[5] = datetime.now().strftime('%Y-%m-%d')
-            
+        else:
+            expert_data[5] = datetime.now().strftime('%Y-%m-%d')
+
+        # Эксперт и его коды ГРНТИ пишутся в одной транзакции
+        with self.get_cursor() as cursor:
             cursor.execute(expert_query, expert_data)
-            expert_id = cursor.fetchone()[0]
-            
-            # Вставляем коды ГРНТИ
+            row, row_key = self.fetch_changed_row(cursor, 'expert')
+            expert_id = row[self.get_page_source('expert').columns.index('id')]
+
+            # Вставляем все коды ГРНТИ одним многострочным INSERT
             if grnti_codes:
-                grnti_query = """
-                    INSERT INTO expert_grnti (id, rubric, subrubric, siscipline) 
-                    VALUES (%s, %s, %s, %s)
-                """
-                for code, subrubric, discipline in grnti_codes:
-                    cursor.execute(grnti_query, (expert_id, code, subrubric, discipline))
-            
-            self.connection.commit()
-            return expert_id
-            
+                execute_values(
+                    cursor,
+                    "INSERT INTO expert_grnti (id, rubric, subrubric, siscipline) VALUES %s",
+                    [(expert_id, code, subrubric, discipline) for code, subrubric, discipline in grnti_codes]
+                )
+
+        return row, row_key
+
+    def get_regions(self):
+        """Получить список уникальных регионов"""
+        with self.get_cursor() as cursor:
+            cursor.execute("SELECT DISTINCT region FROM reg_obl_city ORDER BY region")
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_cities_by_region(self, region):
+        """Получить список городов по региону"""
+        with self.get_cursor() as cursor:
+            self.execute_prepared(cursor, 'cities_by_region', (region,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_all_cities(self):
+        """Получить все города с регионом и субъектом федерации"""
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT city, region, oblname
+                FROM reg_obl_city
+                ORDER BY city
+            """)
+            return cursor.fetchall()
+
+    def get_city_index(self, cities=None):
+        """Индекс городов для автодополнения (CityIndex); строится один раз для версии reg_obl_city.
+
+        cities - уже прочитанный список get_all_cities (например, загруженный асинхронно)
+        """
+        with self.get_cursor() as cursor:
+            versions = self.read_table_versions(cursor, ('reg_obl_city',))
+        index = self.cached_city_index(versions)
+        if index is not None:
+            return index
+
+        index = CityIndex(cities if cities is not None else self.get_all_cities())
+        if versions is not None:
+            self.result_cache.put(('city_index', 'reg_obl_city'), versions, index, index.memory_size())
+        return index
+
+    def cached_city_index(self, versions):
+        """Индекс городов из кэша для версии reg_obl_city versions (None, если его нет)"""
+        if versions is None:
+            return None
+        return self.result_cache.get(('city_index', 'reg_obl_city'), versions)
+
+    def search_cities(self, search_text):
+        """Поиск городов по частичному совпадению"""
+        with self.get_cursor() as cursor:
+            self.execute_prepared(cursor, 'search_cities', (f"%{search_text}%",))
+            return cursor.fetchall()
+
+    def get_expert_grnti_codes(self, expert_id):
+        """Получить коды ГРНТИ эксперта"""
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT rubric, subrubric, siscipline
+                FROM expert_grnti
+                WHERE id = %s
+            """, (expert_id,))
+            return cursor.fetchall()
+
+    def update_expert_with_grnti(self, expert_id, expert_data, grnti_codes):
+        """Обновить эксперта с кодами ГРНТИ.
+
+        Возвращает строку эксперта в формате get_page('expert') и ее ключ.
+        """
+        # Обновляем данные эксперта
+        expert_query = f"""
+            UPDATE expert t
+            SET name = %s, region = %s, city = %s, keywords = %s, group_count = %s, input_date = %s
+            WHERE t.id = %s
+            {self.get_page_source('expert').returning}
+        """
+
+        # Форматируем дату для базы данных
+        date_str = expert_data[5]  # Дата добавления
+        if date_str:
+            db_date = DateValidator.format_date_for_db(date_str)
+            if db_date:
+                expert_data[5] = db_date
+            else:
+                expert_data[5] = datetime.now().strftime('%Y-%m-%d')
+        else:
+            expert_data[5] = datetime.now().strftime('%Y-%m-%d')
+
+        # Добавляем expert_id в конец для WHERE условия
+        update_data = expert_data + [expert_id]
+
+        with self.get_cursor() as cursor:
+            cursor.execute(expert_query, update_data)
+            changed = self.fetch_changed_row(cursor, 'expert')
+
+            # Сравниваем новый набор кодов ГРНТИ с сохраненным на стороне сервера:
+            # удаляются только исчезнувшие коды и вставляются только новые,
+            # неизмененные строки не трогаются
+            params = {
+                'expert_id': expert_id,
+                'rubrics': [code for code, _, _ in grnti_codes],
+                'subrubrics': [subrubric for _, subrubric, _ in grnti_codes],
+                'disciplines': [discipline for _, _, discipline in grnti_codes],
+            }
+            new_codes = """
+                SELECT DISTINCT *
+                FROM unnest(%(rubrics)s::smallint[], %(subrubrics)s::smallint[], %(disciplines)s::smallint[])
+                     AS n(rubric, subrubric, siscipline)
+            """
+            # Удаление идет отдельным запросом до вставки: иначе код с измененной подрубрикой
+            # нарушил бы первичный ключ (id, rubric), пока старая строка еще не удалена
+            cursor.execute(f"""
+                DELETE FROM expert_grnti eg
+                WHERE eg.id = %(expert_id)s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM ({new_codes}) n
+                      WHERE n.rubric = eg.rubric
+                        AND n.subrubric IS NOT DISTINCT FROM eg.subrubric
+                        AND n.siscipline IS NOT DISTINCT FROM eg.siscipline
+                  )
+            """, params)
+            cursor.execute(f"""
+                INSERT INTO expert_grnti (id, rubric, subrubric, siscipline)
+                SELECT %(expert_id)s, n.rubric, n.subrubric, n.siscipline
+                FROM ({new_codes}) n
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM expert_grnti eg
+                    WHERE eg.id = %(expert_id)s
+                      AND eg.rubric = n.rubric
+                      AND eg.subrubric IS NOT DISTINCT FROM n.subrubric
+                      AND eg.siscipline IS NOT DISTINCT FROM n.siscipline
+                )
+            """, params)
+
+        return changed
+
+
+class AsyncDatabaseManager:
+    """Асинхронное чтение данных через asyncpg: запросы не блокируют GUI и могут идти параллельно.
+
+    Метаданные таблиц и тексты запросов берутся у синхронного DatabaseManager.
+    """
+
+    # Параметры подключения psycopg2, которые понимает asyncpg
+    CONNECT_PARAMS = {'host': 'host', 'port': 'port', 'user': 'user', 'password': 'password',
+                      'dbname': 'database', 'database': 'database'}
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def get_pool(self):
+        """Создает пул соединений при первом обращении (нужен работающий цикл событий)"""
+        async with self._pool_lock:
+            if self.pool is None:
+                params = {self.CONNECT_PARAMS[key]: value for key, value in DB_CONFIG.items()
+                          if key in self.CONNECT_PARAMS}
+                if 'port' in params:
+                    params['port'] = int(params['port'])
+                if DB_STATEMENT_TIMEOUT:
+                    params['server_settings'] = {'statement_timeout': str(int(DB_STATEMENT_TIMEOUT * 1000))}
+                self.pool = await asyncpg.create_pool(min_size=DB_POOL_MIN_CONN, max_size=DB_POOL_MAX_CONN,
+                                                      init=self.init_connection, **params)
+        return self.pool
+
+    @staticmethod
+    async def init_connection(connection):
+        """ctid передается строкой '(блок,смещение)', как в psycopg2: ключи строк из страниц
+        обоих менеджеров подставляются в запросы изменения и чтения любого из них"""
+        await connection.set_type_codec('tid', schema='pg_catalog', encoder=str, decoder=str, format='text')
+
+    @staticmethod
+    def convert_query(query):
+        """Заменяет параметры %s (стиль psycopg2) на $1, $2, ... (стиль asyncpg)"""
+        counter = itertools.count(1)
+        return re.sub(r'%s', lambda match: f"${next(counter)}", query)
+
+    async def fetch(self, query, *params):
+        """Выполняет запрос и возвращает строки как кортежи"""
+        pool = await self.get_pool()
+        rows = await pool.fetch(self.convert_query(query), *params)
+        return [tuple(row) for row in rows]
+
+    async def read_table_versions(self, connection, tables):
+        """Асинхронный вариант DatabaseManager.read_table_versions"""
+        db = self.db_manager
+        if not db.has_table_versions():
+            return None
+        rows = await connection.fetch(self.convert_query(TABLE_VERSIONS_QUERY), list(tables))
+        return db.make_table_versions(tables, [tuple(row) for row in rows])
+
+    async def get_page(self, table_name, after_key=None, limit=None, order=None):
+        """Асинхронный вариант DatabaseManager.get_page.
+
+        При отмене задачи asyncpg сам прерывает выполняющийся запрос на сервере.
+        """
+        db = self.db_manager
+        plan = db.plan_page(table_name, after_key, limit, order)
+        key = ('page', table_name, after_key, plan.limit, plan.order)
+        rows = []
+        pool = await self.get_pool()
+        async with pool.acquire() as connection:
+            # Кэш общий с синхронным DatabaseManager
+            versions = await self.read_table_versions(connection, db.get_view_tables(table_name))
+            if versions is not None:
+                page = db.result_cache.get(key, versions)
+                if page is not None:
+                    return page
+
+            queries = plan.queries
+            if plan.prepare is not None:
+                query, params = plan.prepare
+                queries = plan.bind(await connection.fetchval(self.convert_query(query), *params))
+            for query, params in queries:
+                result = await connection.fetch(self.convert_query(query), *params, plan.remaining(rows))
+                rows.extend(tuple(row) for row in result)
+                if plan.is_full(rows):
+                    break
+        page = plan.make_page(rows)
+        if versions is not None:
+            db.result_cache.put(key, versions, page, estimate_size(page.rows))
+        return page
+
+    async def get_regions(self):
+        """Получить список уникальных регионов"""
+        rows = await self.fetch("SELECT DISTINCT region FROM reg_obl_city ORDER BY region")
+        return [row[0] for row in rows]
+
+    async def get_cities_by_region(self, region):
+        """Получить список городов по региону"""
+        rows = await self.fetch(PREPARED_STATEMENTS['cities_by_region'], region)
+        return [row[0] for row in rows]
+
+    async def get_all_cities(self):
+        """Получить все города с регионом и субъектом федерации"""
+        return await self.fetch("SELECT DISTINCT city, region, oblname FROM reg_obl_city ORDER BY city")
+
+    async def get_index_cities(self):
+        """Города для индекса автодополнения (CityIndex); None, если индекс текущей версии
+        reg_obl_city уже в кэше - тогда весь справочник не передается заново"""
+        pool = await self.get_pool()
+        async with pool.acquire() as connection:
+            versions = await self.read_table_versions(connection, ('reg_obl_city',))
+        if self.db_manager.cached_city_index(versions) is not None:
+            return None
+        return await self.get_all_cities()
+
+    async def search_cities(self, search_text):
+        """Поиск городов по частичному совпадению"""
+        return await self.fetch(PREPARED_STATEMENTS['search_cities'], f"%{search_text}%")
+
+    async def get_expert_grnti_codes(self, expert_id):
+        """Получить коды ГРНТИ эксперта"""
+        return await self.fetch("SELECT rubric, subrubric, siscipline FROM expert_grnti WHERE id = %s", expert_id)
+
+    async def get_expert_dialog_data(self, expert_id=None):
+        """Параллельно загружает справочники для диалога эксперта"""
+        requests = [self.get_regions(), self.get_index_cities()]
+        if expert_id is not None:
+            requests.append(self.get_expert_grnti_codes(expert_id))
+        results = await asyncio.gather(*requests)
+        data = {'regions': results[0], 'cities': results[1]}
+        if expert_id is not None:
+            data['grnti_codes'] = results[2]
+        return data
+
+    def close(self):
+        """Закрывает соединения пула без ожидания (вызывается при выходе)"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+
+class QueryWorkerSignals(QObject):
+    """Сигналы QueryWorker; доставляются в поток GUI"""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+
+class QueryWorker(QRunnable):
+    """Выполняет чтение из базы в пуле потоков, не блокируя окно.
+
+    Функция получает именованный аргумент cancel (QueryCancel). Результат отмененного
+    запроса не передается: сигнал не испускается.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancel_token = QueryCancel()
+        self.signals = QueryWorkerSignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args, cancel=self.cancel_token, **self.kwargs)
+        except QueryCancelled:
+            return
         except Exception as e:
-            self.connection.rollback()
-            raise e
+            if not self.cancel_token.cancelled:
+                self.signals.failed.emit(e)
+            return
+        if not self.cancel_token.cancelled:
+            self.signals.finished.emit(result)
+
+    def cancel(self):
+        """Отменяет запрос, в том числе уже выполняющийся на сервере"""
+        self.cancel_token.cancel()
+
+
+class ChangeListener(QObject):
+    """Принимает уведомления об изменении таблиц (LISTEN table_changed, migration/18_10_2026_4_change_notify.sql).
+
+    Отдельное соединение вне пула в режиме autocommit; о поступивших данных
+    сообщает QSocketNotifier, поэтому отдельный поток не нужен.
+    """
+
+    CHANNEL = 'table_changed'
+    RECONNECT_INTERVAL = 5000  # мс до повторного подключения после обрыва
+
+    # таблица, операция, ключи измененных строк (None - неизвестны), серверный процесс автора;
+    # таблица None - уведомления могли быть пропущены (после переподключения)
+    table_changed = pyqtSignal(object, str, object, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.connection = None
+        self.notifier = None
+        self._closed = False
+        self._was_connected = False
+        self.connect_listener()
+
+    def connect_listener(self):
+        if self._closed:
+            return
+        try:
+            self.connection = psycopg2.connect(**DB_CONFIG)
+            self.connection.set_session(autocommit=True)
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.CHANNEL}")
+        except psycopg2.Error as e:
+            print(f"Не удалось подписаться на изменения таблиц: {e}")
+            self.reconnect_later()
+            return
+
+        self.notifier = QSocketNotifier(self.connection.fileno(), QSocketNotifier.Type.Read, self)
+        self.notifier.activated.connect(self.on_activated)
+        if self._was_connected:
+            # Пока соединения не было, изменения могли пройти мимо
+            self.table_changed.emit(None, '', None, 0)
+        self._was_connected = True
+
+    def on_activated(self):
+        try:
+            self.connection.poll()
+        except psycopg2.Error as e:
+            print(f"Соединение для уведомлений потеряно: {e}")
+            self.reconnect_later()
+            return
+
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            try:
+                payload = json.loads(notify.payload)
+            except ValueError:
+                continue
+            self.table_changed.emit(payload.get('table'), payload.get('op') or '', payload.get('keys'), notify.pid)
+
+    def reconnect_later(self):
+        self.disconnect_listener()
+        QTimer.singleShot(self.RECONNECT_INTERVAL, self.connect_listener)
+
+    def disconnect_listener(self):
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+            self.notifier.deleteLater()
+            self.notifier = None
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except psycopg2.Error:
+                pass
+            self.connection = None
+
+    def close(self):
+        self._closed = True
+        self.disconnect_listener()
+
+
+# Таблицы, в которые можно загружать данные из файлов
+IMPORT_TABLES = ('expert', 'expert_grnti', 'grnti_classifier', 'reg_obl_city')
+
+# Допустимые диапазоны целочисленных типов PostgreSQL
+INTEGER_RANGES = {
+    'smallint': (-2 ** 15, 2 ** 15 - 1),
+    'integer': (-2 ** 31, 2 ** 31 - 1),
+    'bigint': (-2 ** 63, 2 ** 63 - 1),
+}
+
+
+class ImportCancelled(Exception):
+    """Импорт прерван пользователем; транзакция откатывается"""
+
+
+class ImportResult:
+    """Итог импорта: сколько строк прочитано и загружено, какие строки отклонены"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.total = 0
+        self.merged = 0
+        self.rejected = []  # (номер строки в файле, причина, значения строки)
+
+    def write_rejected(self, path):
+        """Сохраняет отклоненные строки с причинами в CSV-файл"""
+        with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+            writer = csv.writer(file, delimiter=';')
+            writer.writerow(['Строка', 'Причина'] + self.columns)
+            for line_no, reason, values in self.rejected:
+                writer.writerow([line_no, reason] + ['' if value is None else value for value in values])
+
+
+class DataImporter:
+    """Массовая загрузка CSV/XLSX: проверка строк, COPY во временную таблицу и слияние одной транзакцией"""
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def iter_file_rows(self, path):
+        """Читает строки файла (первая - заголовок)"""
+        if path.lower().endswith('.xlsx'):
+            try:
+                import openpyxl
+            except ImportError:
+                raise RuntimeError("Для импорта файлов XLSX установите пакет openpyxl")
+            workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+            try:
+                yield from workbook.active.iter_rows(values_only=True)
+            finally:
+                workbook.close()
+        else:
+            with open(path, newline='', encoding='utf-8-sig') as file:
+                # Excel в русской локали сохраняет CSV через ';'
+                try:
+                    dialect = csv.Sniffer().sniff(file.read(4096), delimiters=',;\t')
+                except csv.Error:
+                    dialect = csv.excel
+                file.seek(0)
+                yield from csv.reader(file, dialect)
+
+    def map_header(self, schema, header, display_names=None):
+        """Сопоставляет заголовки файла со столбцами таблицы (по имени или русскому названию)"""
+        known = {column.lower(): column for column in schema.columns}
+        for column, title in (display_names or {}).items():
+            if column in schema.columns:
+                known[title.lower()] = column
+
+        columns = []
+        for cell in header:
+            name = str(cell).strip().lower() if cell is not None else ""
+            if name not in known:
+                raise ValueError(f"Столбец '{cell}' не найден в таблице {schema.name}")
+            if known[name] in columns:
+                raise ValueError(f"Столбец '{cell}' указан в файле дважды")
+            columns.append(known[name])
+        return columns
+
+    def normalize_value(self, schema, column, value):
+        """Приводит значение из файла к виду для COPY, при ошибке бросает ValueError"""
+        if value is None:
+            return self.empty_value(schema, column)
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)  # XLSX хранит целые числа как float
+
+        data_type = schema.types[column]
+        if data_type == 'date' and isinstance(value, (date, datetime)):
+            return value.strftime('%Y-%m-%d')
+
+        text = str(value).strip()
+        if not text:
+            return self.empty_value(schema, column)
+
+        if data_type == 'date':
+            db_date = DateValidator.format_date_for_db(text)
+            if not db_date:
+                raise ValueError(f"неверный формат даты в столбце {column}: {text}")
+            return db_date
+
+        if data_type in INTEGER_RANGES:
+            try:
+                number = int(text)
+            except ValueError:
+                raise ValueError(f"столбец {column} должен быть числом: {text}")
+            low, high = INTEGER_RANGES[data_type]
+            if not low <= number <= high:
+                raise ValueError(f"число вне допустимого диапазона в столбце {column}: {text}")
+            return number
+
+        if schema.name == 'expert' and column == 'name':
+            is_valid, text, error_message = NameValidator.validate_and_format_name(text)
+            if not is_valid:
+                raise ValueError(error_message.split('\n')[0])
+
+        max_length = schema.max_lengths.get(column)
+        if max_length and len(text) > max_length:
+            raise ValueError(f"значение в столбце {column} длиннее {max_length} символов")
+        return text
+
+    def empty_value(self, schema, column):
+        """Пустая ячейка: None, если столбец может остаться пустым, иначе ValueError.
+
+        Пустой ключ со значением по умолчанию (serial id) допустим: строка добавится как новая
+        """
+        info = schema.column_info[column]
+        in_key = any(column in key for key in [schema.primary_key] + schema.unique_keys)
+        # ФИО обязательно, как и в диалогах эксперта, хотя столбец допускает NULL
+        if (not info.nullable and not (info.has_default and in_key)) or (schema.name == 'expert' and column == 'name'):
+            raise ValueError(f"не заполнен обязательный столбец {column}")
+        return None
+
+    def import_file(self, table_name, path, display_names=None, progress_callback=None):
+        """Загружает файл в таблицу; все изменения применяются одной транзакцией.
+
+        progress_callback(число обработанных строк) может вернуть False для отмены.
+        """
+        if table_name not in IMPORT_TABLES:
+            raise ValueError(f"Импорт в таблицу {table_name} не поддерживается")
+        schema = self.db_manager.schema.get(table_name)
+        staging = f"import_{table_name}"
+
+        rows = self.iter_file_rows(path)
+        try:
+            header = next(rows, None)
+            if not header:
+                raise ValueError("Файл пуст")
+            # Пустые ячейки в конце заголовка (частый случай в XLSX) не считаются столбцами
+            header = list(header)
+            while header and (header[-1] is None or not str(header[-1]).strip()):
+                header.pop()
+            columns = self.map_header(schema, header, display_names)
+            result = ImportResult(columns)
+
+            with self.db_manager.get_cursor() as cursor:
+                # Промежуточная таблица повторяет типы столбцов файла, но без ограничений и значений
+                # по умолчанию: проверки выполняются при слиянии, последовательности не расходуются
+                cursor.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                               f"SELECT {', '.join(columns)} FROM {table_name} WITH NO DATA")
+                cursor.execute(f"ALTER TABLE {staging} ADD COLUMN import_line integer")
+
+                batch = []
+                for line_no, row in enumerate(rows, start=2):
+                    row = list(row or [])
+                    if not any(cell is not None and str(cell).strip() for cell in row):
+                        continue  # пустые строки пропускаем молча
+                    result.total += 1
+
+                    values = row[:len(columns)] + [None] * (len(columns) - len(row))
+                    try:
+                        if any(cell is not None and str(cell).strip() for cell in row[len(columns):]):
+                            raise ValueError("в строке больше значений, чем столбцов в заголовке")
+                        batch.append([self.normalize_value(schema, column, value)
+                                      for column, value in zip(columns, values)] + [line_no])
+                    except ValueError as e:
+                        result.rejected.append((line_no, str(e), values))
+
+                    if len(batch) >= IMPORT_BATCH_SIZE:
+                        self.copy_batch(cursor, staging, columns, batch)
+                        batch = []
+                        if progress_callback and progress_callback(result.total) is False:
+                            raise ImportCancelled()
+
+                if batch:
+                    self.copy_batch(cursor, staging, columns, batch)
+
+                self.reject_missing_references(cursor, schema, staging, columns, result)
+                self.reject_missing_keys(cursor, schema, staging, columns, result)
+                result.merged = self.merge(cursor, schema, staging, columns)
         finally:
-            cursor.close()
+            rows.close()
+
+        return result
+
+    def copy_batch(self, cursor, staging, columns, batch):
+        """Передает порцию строк во временную таблицу через COPY FROM STDIN"""
+        buffer = io.StringIO()
+        # В формате CSV пустое поле без кавычек - это NULL
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {staging} ({', '.join(columns)}, import_line) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+
+    def reject_missing_references(self, cursor, schema, staging, columns, result):
+        """Отклоняет строки, ссылающиеся на несуществующие записи (например, эксперта)"""
+        for column in columns:
+            if column not in schema.foreign_keys:
+                continue
+            ref_table, ref_column = schema.foreign_keys[column]
+            cursor.execute(f"""
+                DELETE FROM {staging} s
+                WHERE s.{column} IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM {ref_table} r WHERE r.{ref_column} = s.{column})
+                RETURNING s.import_line, {', '.join('s.' + col for col in columns)}
+            """)
+            for line_no, *values in cursor.fetchall():
+                result.rejected.append((
+                    line_no,
+                    f"нет записи {ref_table}.{ref_column} = {values[columns.index(column)]}",
+                    values
+                ))
+        result.rejected.sort(key=lambda item: item[0])
+
+    def merge_key(self, schema, columns):
+        """Ключ для слияния: первичный ключ или UNIQUE, если все его столбцы есть в файле; иначе None"""
+        for candidate in [schema.primary_key] + schema.unique_keys:
+            if candidate and all(col in columns for col in candidate):
+                return candidate
+        return None
+
+    def reject_missing_keys(self, cursor, schema, staging, columns, result):
+        """Отклоняет строки с незаполненным ключом слияния, которые нельзя добавить как новые.
+
+        Новой строка становится, только если весь ключ заполняется значениями по умолчанию
+        (serial id) и в файле есть другие столбцы; иначе ее нечем или не с чем сопоставить.
+        """
+        key = self.merge_key(schema, columns)
+        if key is None:
+            return
+        if all(schema.column_info[col].has_default for col in key) and len(key) < len(columns):
+            return
+        key_present = ' AND '.join(f"{col} IS NOT NULL" for col in key)
+        cursor.execute(f"""
+            DELETE FROM {staging}
+            WHERE NOT ({key_present})
+            RETURNING import_line, {', '.join(columns)}
+        """)
+        for line_no, *values in cursor.fetchall():
+            result.rejected.append((line_no, f"не заполнен ключ ({', '.join(key)})", values))
+        result.rejected.sort(key=lambda item: item[0])
+
+    def merge(self, cursor, schema, staging, columns):
+        """Переносит строки из временной таблицы в основную, возвращает число затронутых строк"""
+        columns_str = ', '.join(columns)
+        key = self.merge_key(schema, columns)
+
+        if key is None:
+            # Нет ключа - добавляем в порядке файла только строки, которых еще нет в таблице.
+            # Строки файла и таблицы группируются вместе: новые - группы без строк таблицы.
+            # GROUP BY считает пустые значения равными и хеширует строки, а сравнение
+            # IS NOT DISTINCT FROM в NOT EXISTS выполнялось бы вложенными циклами
+            cursor.execute(f"""
+                INSERT INTO {schema.name} ({columns_str})
+                SELECT {columns_str}
+                FROM (
+                    SELECT {columns_str}, import_line FROM {staging}
+                    UNION ALL
+                    SELECT {columns_str}, NULL FROM {schema.name}
+                ) s
+                GROUP BY {columns_str}
+                HAVING count(import_line) = count(*)
+                ORDER BY min(import_line)
+            """)
+            return cursor.rowcount
+
+        key_str = ', '.join(key)
+        key_present = ' AND '.join(f"{col} IS NOT NULL" for col in key)
+        other_columns = [col for col in columns if col not in key]
+        if other_columns:
+            action = "DO UPDATE SET " + ', '.join(f"{col} = EXCLUDED.{col}" for col in other_columns)
+        else:
+            action = "DO NOTHING"
+
+        # Строки с ключом обновляют существующие записи; при повторе ключа в файле побеждает последняя
+        cursor.execute(f"""
+            INSERT INTO {schema.name} ({columns_str})
+            SELECT DISTINCT ON ({key_str}) {columns_str}
+            FROM {staging}
+            WHERE {key_present}
+            ORDER BY {key_str}, import_line DESC
+            ON CONFLICT ({key_str}) {action}
+        """)
+        merged = cursor.rowcount
+
+        # Строки без ключа добавляются как новые, ключ заполнит значение по умолчанию
+        # (остальные строки без ключа отклонены в reject_missing_keys)
+        if other_columns:
+            other_str = ', '.join(other_columns)
+            cursor.execute(f"""
+                INSERT INTO {schema.name} ({other_str})
+                SELECT {other_str} FROM {staging}
+                WHERE NOT ({key_present})
+                ORDER BY import_line
+            """)
+            merged += cursor.rowcount
+
+        # Явно заданные значения serial-ключа не сдвигают последовательность - догоняем ее
+        for col in key:
+            cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", (schema.name, col))
+            sequence = cursor.fetchone()[0]
+            if sequence:
+                cursor.execute(f"SELECT setval(%s, GREATEST(COALESCE(MAX({col}), 0), 1)) FROM {schema.name}",
+                               (sequence,))
+        return merged
+
+
+# Соответствие типов PostgreSQL типам Apache Arrow для выгрузки в Parquet
+ARROW_TYPES = {
+    'smallint': 'int16',
+    'integer': 'int32',
+    'bigint': 'int64',
+    'real': 'float32',
+    'double precision': 'float64',
+    'boolean': 'bool_',
+    'date': 'date32',
+}
+
+
+class DataExporter:
+    """Потоковая выгрузка таблицы или объединенного представления в CSV, XLSX и Parquet"""
+
+    FORMATS = ('.csv', '.xlsx', '.parquet')
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def build_query(self, table_name, display_names=None, order=None, format_dates=True):
+        """Строит SELECT с русскими названиями столбцов и датами в формате ДД.ММ.ГГГГ"""
+        source = self.db_manager.get_page_source(table_name)
+        types = self.db_manager.get_column_types(table_name)
+        display_names = display_names or {}
+
+        select_list = []
+        for column in source.columns:
+            expr = source.column_exprs[column]
+            if format_dates and types.get(column) == 'date':
+                expr = f"to_char({expr}, 'DD.MM.YYYY')"
+            alias = display_names.get(column, column).replace('"', '""')
+            select_list.append(f'{expr} AS "{alias}"')
+
+        # Порядок строк тот же, что и в таблице на экране
+        order_by = [f"{expr} {'ASC NULLS FIRST' if ascending else 'DESC NULLS LAST'}"
+                    for expr, _, ascending in source.order_terms(order or source.default_order)]
+        return (f"SELECT {', '.join(select_list)} FROM {source.from_clause} "
+                f"ORDER BY {', '.join(order_by)}")
+
+    def export(self, table_name, path, display_names=None, order=None, progress_callback=None):
+        """Выгружает данные в файл; формат определяется расширением. Возвращает число строк"""
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.csv':
+            return self.export_csv(table_name, path, display_names, order)
+        if extension == '.xlsx':
+            return self.export_xlsx(table_name, path, display_names, order, progress_callback)
+        if extension == '.parquet':
+            return self.export_parquet(table_name, path, display_names, order, progress_callback)
+        raise ValueError(f"Неподдерживаемый формат файла: {extension}")
+
+    def export_csv(self, table_name, path, display_names=None, order=None):
+        """CSV формирует сам сервер (COPY ... TO STDOUT), строки сразу пишутся в файл"""
+        query = self.build_query(table_name, display_names, order)
+        with self.db_manager.get_cursor() as cursor:
+            with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER, DELIMITER ';')", file)
+            return cursor.rowcount
+
+    def export_xlsx(self, table_name, path, display_names=None, order=None, progress_callback=None):
+        """XLSX пишется в потоковом режиме openpyxl из серверного курсора"""
+        try:
+            import openpyxl
+        except ImportError:
+            raise RuntimeError("Для выгрузки в XLSX установите пакет openpyxl")
+
+        source = self.db_manager.get_page_source(table_name)
+        display_names = display_names or {}
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet(table_name)
+        sheet.append([display_names.get(column, column) for column in source.columns])
+
+        count = 0
+        for rows in self.db_manager.iter_query(self.build_query(table_name, display_names, order)):
+            for row in rows:
+                sheet.append(row)
+            count += len(rows)
+            if progress_callback:
+                progress_callback(count)
+        workbook.save(path)
+        return count
+
+    def export_parquet(self, table_name, path, display_names=None, order=None, progress_callback=None):
+        """Parquet пишется группами строк по мере чтения серверного курсора; даты остаются датами"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Для выгрузки в Parquet установите пакет pyarrow")
+
+        source = self.db_manager.get_page_source(table_name)
+        types = self.db_manager.get_column_types(table_name)
+        display_names = display_names or {}
+        arrow_types = [getattr(pa, ARROW_TYPES.get(types.get(column), 'string'))() for column in source.columns]
+        arrow_schema = pa.schema([
+            (display_names.get(column, column), arrow_type)
+            for column, arrow_type in zip(source.columns, arrow_types)
+        ])
+
+        count = 0
+        query = self.build_query(table_name, display_names, order, format_dates=False)
+        with pq.ParquetWriter(path, arrow_schema) as writer:
+            for rows in self.db_manager.iter_query(query):
+                arrays = []
+                for index, arrow_type in enumerate(arrow_types):
+                    values = [row[index] for row in rows]
+                    if arrow_type == pa.string():
+                        values = [None if value is None else str(value) for value in values]
+                    arrays.append(pa.array(values, type=arrow_type))
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=arrow_schema))
+                count += len(rows)
+                if progress_callback:
+                    progress_callback(count)
+        return count
+
+
+class ObjectColumn:
+    """Столбец значений любого типа (списки кодов, ключи, уникальный текст) - обычный список"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+
+    def accepts(self, value):
+        return True
+
+    def get(self, index):
+        return self.values[index]
+
+    def set(self, index, value):
+        self.values[index] = value
+
+    def insert(self, index, value):
+        self.values.insert(index, value)
+
+    def delete(self, index):
+        del self.values[index]
+
+    def extend(self, values):
+        self.values.extend(values)
+
+    def to_list(self):
+        return list(self.values)
+
+
+class ArrayColumn:
+    """Столбец целых чисел или дат: значения в array, NULL отмечены в отдельной маске"""
+
+    def __init__(self, typecode, encode, decode, accepts):
+        self.values = array(typecode)
+        self.nulls = bytearray()
+        self.encode = encode
+        self.decode = decode
+        self.accepts_value = accepts
+
+    def accepts(self, value):
+        return value is None or self.accepts_value(value)
+
+    def get(self, index):
+        return None if self.nulls[index] else self.decode(self.values[index])
+
+    def set(self, index, value):
+        self.values[index] = 0 if value is None else self.encode(value)
+        self.nulls[index] = value is None
+
+    def insert(self, index, value):
+        self.values.insert(index, 0 if value is None else self.encode(value))
+        self.nulls.insert(index, value is None)
+
+    def delete(self, index):
+        del self.values[index]
+        del self.nulls[index]
+
+    def extend(self, values):
+        encode = self.encode
+        self.values.extend(0 if value is None else encode(value) for value in values)
+        self.nulls.extend(value is None for value in values)
+
+    def to_list(self):
+        return [self.get(index) for index in range(len(self.values))]
+
+
+def is_int64(value):
+    return type(value) is int and -2 ** 63 <= value < 2 ** 63
+
+
+def is_date(value):
+    return type(value) is date
+
+
+def int_column():
+    return ArrayColumn('q', int, int, is_int64)
+
+
+def date_column():
+    # Дата хранится номером дня (date.toordinal), он помещается в 32 бита
+    return ArrayColumn('i', date.toordinal, date.fromordinal, is_date)
+
+
+class DictionaryColumn:
+    """Текстовый столбец со словарным кодированием: каждая строка хранится один раз,
+    в столбце - номера строк словаря. Подходит для регионов, городов, описаний рубрик"""
+
+    # Столбец с большим числом разных значений (ФИО) выгоднее хранить списком
+    MAX_DISTINCT = 65536
+
+    def __init__(self):
+        self.codes = array('I')
+        self.dictionary = [None]  # номер 0 - NULL
+        self.positions = {None: 0}
+
+    def accepts(self, value):
+        return value is None or type(value) is str
+
+    def code(self, value):
+        code = self.positions.get(value)
+        if code is None:
+            code = self.positions[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        return code
+
+    def get(self, index):
+        return self.dictionary[self.codes[index]]
+
+    def set(self, index, value):
+        self.codes[index] = self.code(value)
+
+    def insert(self, index, value):
+        self.codes.insert(index, self.code(value))
+
+    def delete(self, index):
+        del self.codes[index]
+
+    def extend(self, values):
+        code = self.code
+        self.codes.extend(code(value) for value in values)
+
+    def to_list(self):
+        dictionary = self.dictionary
+        return [dictionary[code] for code in self.codes]
+
+    def too_distinct(self):
+        """Разных значений почти столько же, сколько строк - словарь только занимает память"""
+        distinct = len(self.dictionary)
+        return distinct > self.MAX_DISTINCT or (len(self.codes) >= 1000 and distinct > len(self.codes) // 2)
+
+
+class ColumnarRows:
+    """Строки результата, хранящиеся по столбцам.
+
+    Целые числа и даты лежат в массивах array, текст кодируется словарем, остальное - списками.
+    Тип столбца выбирается по первому непустому значению; значение другого типа переводит
+    столбец в обычный список. Снаружи это список кортежей: len, rows[i], rows[i] = row,
+    insert, del rows[i], extend; value(i, j) читает одно значение без сборки кортежа.
+    """
+
+    def __init__(self, rows=()):
+        self.columns = None
+        self.untyped = set()
+        self.count = 0
+        self.extend(rows)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("индекс строки вне диапазона")
+        return tuple(column.get(index) for column in self.columns)
+
+    def value(self, index, column):
+        return self.columns[column].get(index)
+
+    def __setitem__(self, index, row):
+        self.check_index(index)
+        self.prepare(row)
+        for column, value in zip(self.columns, row):
+            column.set(index, value)
+
+    def __delitem__(self, index):
+        self.check_index(index)
+        for column in self.columns:
+            column.delete(index)
+        self.count -= 1
+
+    def insert(self, index, row):
+        index = max(0, min(index, self.count))
+        self.prepare(row)
+        for column, value in zip(self.columns, row):
+            column.insert(index, value)
+        self.count += 1
+
+    def extend(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        for row in rows:
+            self.prepare(row)
+        for position, column in enumerate(self.columns):
+            column.extend([row[position] for row in rows])
+            if isinstance(column, DictionaryColumn) and column.too_distinct():
+                self.columns[position] = ObjectColumn(column.to_list())
+        self.count += len(rows)
+
+    def check_index(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError("индекс строки вне диапазона")
+
+    def prepare(self, row):
+        """Выбирает или меняет тип столбцов так, чтобы в них поместились значения строки"""
+        if self.columns is None:
+            self.columns = [ObjectColumn() for value in row]
+            # Пока в столбце только NULL, он хранится списком до первого значения
+            self.untyped = set(range(len(row)))
+        for position, value in enumerate(row):
+            column = self.columns[position]
+            if position in self.untyped:
+                if value is None:
+                    continue
+                self.untyped.discard(position)
+                if is_int64(value):
+                    new_column = int_column()
+                elif is_date(value):
+                    new_column = date_column()
+                elif type(value) is str:
+                    new_column = DictionaryColumn()
+                else:
+                    continue
+                new_column.extend(column.values)
+            elif column.accepts(value):
+                continue
+            else:
+                new_column = ObjectColumn(column.to_list())
+            self.columns[position] = new_column
+
+
+class ResultTableModel(QAbstractTableModel):
+    """Модель табличного представления над строками результата в том виде, как их вернула база.
+
+    Строки хранятся по столбцам (ColumnarRows). Текст ячейки строится в data() только
+    для ячеек, которые показывает QTableView, поэтому загруженные страницы не создают
+    объектов Qt на каждую ячейку.
+    Сортирует сервер: sort() передает столбец и направление в sort_handler;
+    следующую страницу загружает fetch_handler (fetchMore).
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = ColumnarRows()  # строки результата (значения в порядке столбцов выборки)
+        self.columns = []         # имена столбцов выборки
+        self.column_indexes = []  # позиция в строке для каждого показанного столбца
+        self.headers = []         # заголовки показанных столбцов
+        self.formatters = []      # formatter(значение) -> текст ячейки для каждого столбца выборки
+        self.sort_handler = None
+        # Следующие страницы: QTableView вызывает fetchMore, когда прокрутка доходит до конца
+        self.more_available = False
+        self.fetch_handler = None
+
+    def reset(self, rows, columns, visible_columns, headers, formatters):
+        """Задает строки (ColumnarRows, которые дальше изменяют методы модели) и показанные столбцы"""
+        self.beginResetModel()
+        self.rows = rows
+        self.columns = columns
+        self.column_indexes = [columns.index(col) for col in visible_columns]
+        self.headers = headers
+        self.formatters = formatters
+        self.more_available = False
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
 
-    def get_regions(self):
-        """Получить список уникальных регионов"""
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT DISTINCT region FROM reg_obl_city ORDER BY region")
-        regions = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        return regions
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.column_indexes)
 
-    def get_cities_by_region(self, region):
-        """Получить список городов по региону"""
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT DISTINCT city FROM reg_obl_city WHERE region = %s ORDER BY city", (region,))
-        cities = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        return cities
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        position = self.column_indexes[index.column()]
+        return self.formatters[position](self.rows.value(index.row(), position))
 
-    def search_cities(self, search_text):
-        """Поиск городов по частичному совпадению"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT DISTINCT city, region, oblname
-            FROM reg_obl_city
-            WHERE city ILIKE %s
-            ORDER BY city
-        """, (f"%{search_text}%",))
-        results = cursor.fetchall()
-        cursor.close()
-        return results
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            if section < len(self.headers):
+                return self.headers[section]
+            return None
+        return super().headerData(section, orientation, role)
 
-    def update_expert_with_grnti(self, expert_id, expert_data, grnti_codes):
-        """Обновить эксперта с кодами ГРНТИ"""
-        cursor = self.connection.cursor()
-        
-        try:
-            # Обновляем данные эксперта
-            expert_query = """
-                UPDATE expert
-                SET name = %s, region = %s, city = %s, keywords = %s, group_count = %s, input_date = %s
-                WHERE id = %s
-            """
-            
-            # Форматируем дату для базы данных
-            date_str = expert_data[5]  # Дата добавления
-            if date_str:
-                db_date = DateValidator.format_date_for_db(date_str)
-                if db_date:
-                    expert_data[5] = db_date
-                else:
-                    expert_data[5] = datetime.now().strftime('%Y-%m-%d')
-            else:
-                expert_data[5] = datetime.now().strftime('%Y-%m-%d')
-            
-            # Добавляем expert_id в конец для WHERE условия
-            update_data = expert_data + [expert_id]
-            cursor.execute(expert_query, update_data)
-            
-            # Удаляем старые коды ГРНТИ
-            cursor.execute("DELETE FROM expert_grnti WHERE id = %s", (expert_id,))
-            
-            # Вставляем новые коды ГРНТИ
-            if grnti_codes:
-                grnti_query = """
-                    INSERT INTO expert_grnti (id, rubric, subrubric, siscipline)
-                    VALUES (%s, %s, %s, %s)
-                """
-                for code, subrubric, discipline in grnti_codes:
-                    cursor.execute(grnti_query, (expert_id, code, subrubric, discipline))
-            
-            self.connection.commit()
-            return expert_id
-            
-        except Exception as e:
-            self.connection.rollback()
-            raise e
-        finally:
-            cursor.close()
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if self.sort_handler is not None:
+            self.sort_handler(column, order == Qt.SortOrder.AscendingOrder)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.more_available
+
+    def fetchMore(self, parent=QModelIndex()):
+        # Страница загружается в фоне и добавляется через append_rows
+        if not parent.isValid() and self.fetch_handler is not None:
+            self.fetch_handler()
+
+    def append_rows(self, rows):
+        """Дописывает строки в конец"""
+        if not rows:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
+    def insert_row(self, index, row):
+        self.beginInsertRows(QModelIndex(), index, index)
+        self.rows.insert(index, row)
+        self.endInsertRows()
+
+    def replace_row(self, index, row):
+        self.rows[index] = row
+        self.dataChanged.emit(self.index(index, 0), self.index(index, self.columnCount() - 1))
+
+    def remove_row(self, index):
+        self.beginRemoveRows(QModelIndex(), index, index)
+        del self.rows[index]
+        self.endRemoveRows()
+
+
+class CityIndex:
+    """Индекс названий городов для автодополнения: поиск подстроки без просмотра всего списка.
+
+    Для каждого сочетания двух и трех соседних букв названия хранится упорядоченный массив
+    номеров городов, в названиях которых оно встречается. Кандидаты берутся из самого
+    короткого массива для букв запроса или из раздела региона, если он короче,
+    и проверяются на вхождение подстроки. Запрос, продолжающий предыдущий, проверяет только
+    его совпадения; результаты последних запросов хранятся в LRU-кэше.
+    """
+
+    CACHE_SIZE = 256         # запросов в кэше результатов
+    FULL_SCAN_LIMIT = 2000   # до скольких кандидатов совпадения ищутся все (для следующего запроса)
+
+    def __init__(self, cities):
+        self.cities = list(cities)  # (город, регион, субъект) в порядке get_all_cities
+        self.names = [(city or "").lower() for city, _, _ in self.cities]
+        self.regions = {}  # регион -> номера его городов
+        self.grams = {}    # две или три буквы -> номера городов, в названии которых они есть
+        for number, (name, (_, region, _)) in enumerate(zip(self.names, self.cities)):
+            self.regions.setdefault(region, array('I')).append(number)
+            grams = {name[start:start + size] for size in (2, 3) for start in range(len(name) - size + 1)}
+            for gram in grams:
+                postings = self.grams.get(gram)
+                if postings is None:
+                    postings = self.grams[gram] = array('I')
+                postings.append(number)
+        self._results = OrderedDict()  # (регион, текст, limit) -> найденные города
+        self._last = None  # (регион, текст, номера всех совпадений) последнего полного поиска
+
+    def memory_size(self):
+        """Приблизительный объем памяти индекса в байтах (для ResultCache)"""
+        arrays = itertools.chain(self.grams.values(), self.regions.values())
+        return (estimate_size(self.cities) + sum(sys.getsizeof(name) for name in self.names) +
+                sys.getsizeof(self.grams) + sum(sys.getsizeof(postings) for postings in arrays))
+
+    def candidates(self, text, region):
+        """Номера городов по возрастанию, среди которых есть все совпадения text"""
+        last = self._last
+        if last is not None and last[0] == region and last[1] in text:
+            return last[2]
+        lists = [self.regions.get(region, ())] if region is not None else []
+        size = min(len(text), 3)
+        if size >= 2:
+            lists.extend(self.grams.get(text[start:start + size], ())
+                         for start in range(len(text) - size + 1))
+        if not lists:
+            return range(len(self.cities))
+        return min(lists, key=len)
+
+    def search(self, text, region=None, limit=20):
+        """Первые limit городов (по порядку списка), в названии которых есть text, без учета регистра"""
+        text = text.lower()
+        key = (region, text, limit)
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            return result
+
+        candidates = self.candidates(text, region)
+        names, cities = self.names, self.cities
+        matches = (number for number in candidates
+                   if text in names[number] and (region is None or cities[number][1] == region))
+        if len(candidates) <= self.FULL_SCAN_LIMIT:
+            matches = list(matches)
+            self._last = (region, text, matches)
+        result = [cities[number] for number in itertools.islice(matches, limit)]
+
+        self._results[key] = result
+        if len(self._results) > self.CACHE_SIZE:
+            self._results.popitem(last=False)
+        return result
 
 
 class CityComboBox(QComboBox):
     """ComboBox с автодополнением для городов"""
     
-    def __init__(self, db_manager, parent=None):
+    def __init__(self, db_manager, parent=None, cities=None):
         super().__init__(parent)
         self.db_manager = db_manager
         self.current_region = None  # Текущий выбранный регион
         self.setEditable(True)
         self.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
         
-        # Кэш для результатов поиска
-        self.search_cache = {}
-        
         # Таймер для задержки поиска
         self.search_timer = QTimer()
         self.search_timer.setSingleShot(True)
@@ -269,35 +2502,26 @@ class CityComboBox(QComboBox):
         self.lineEdit().textChanged.connect(self.on_text_changed)
         self.currentTextChanged.connect(self.on_text_changed)
         
-        # Загружаем все города при инициализации для быстрого поиска
-        self.load_all_cities()
+        # Индекс всех городов для быстрого поиска (из заранее загруженного списка,
+        # если он есть; общий для всех диалогов, пока reg_obl_city не изменилась)
+        self.load_city_index(cities)
     
-    def load_all_cities(self):
-        """Загружает все города в кэш для быстрого поиска"""
+    def load_city_index(self, cities=None):
+        """Загружает индекс городов для поиска"""
         try:
-            if not self.db_manager or not self.db_manager.connection:
-                self.all_cities = []
+            if not self.db_manager:
+                self.city_index = CityIndex(cities or [])
                 return
-                
-            cursor = self.db_manager.connection.cursor()
-            cursor.execute("""
-                SELECT DISTINCT city, region, oblname
-                FROM reg_obl_city
-                ORDER BY city
-            """)
-            self.all_cities = cursor.fetchall()
-            cursor.close()
-            print(f"Загружено {len(self.all_cities)} городов в кэш")
+
+            self.city_index = self.db_manager.get_city_index(cities)
         except Exception as e:
             print(f"Ошибка загрузки городов: {e}")
-            self.all_cities = []
+            self.city_index = CityIndex([])
     
     def set_region(self, region):
         """Устанавливает регион для фильтрации городов"""
         if self.current_region != region:
             self.current_region = region
-            # Очищаем кэш поиска при смене региона
-            self.search_cache = {}
             # Очищаем текущий список городов
             self.clear()
             # Очищаем поле ввода
@@ -320,30 +2544,8 @@ class CityComboBox(QComboBox):
         if len(text) < 2:
             return
             
-        # Создаем ключ кэша с учетом региона
-        cache_key = f"{text}_{self.current_region or 'all'}"
-        
-        # Проверяем кэш
-        if cache_key in self.search_cache:
-            self.update_cities_list(self.search_cache[cache_key])
-            return
-        
-        # Выполняем поиск в кэше
-        search_text = text.lower()
-        filtered_cities = []
-        
-        for city, region, oblname in self.all_cities:
-            # Фильтруем по региону, если он выбран
-            if self.current_region and region != self.current_region:
-                continue
-                
-            if search_text in city.lower():
-                filtered_cities.append((city, region, oblname))
-                if len(filtered_cities) >= 20:  # Ограничиваем количество результатов
-                    break
-        
-        # Сохраняем в кэш
-        self.search_cache[cache_key] = filtered_cities
+        # Ищем по индексу с учетом региона (не больше 20 результатов)
+        filtered_cities = self.city_index.search(text, self.current_region or None, limit=20)
         
         # Обновляем список
         self.update_cities_list(filtered_cities)
@@ -372,13 +2574,14 @@ class CityComboBox(QComboBox):
 class EditDialog(QDialog):
     """Диалоговое окно для добавления/редактирования записей"""
 
-    def __init__(self, table_name, columns, data=None, parent=None, display_names=None, date_columns=None):
+    def __init__(self, table_name, columns, data=None, parent=None, display_names=None, column_info=None):
         super().__init__(parent)
         self.table_name = table_name
         self.columns = columns
-        self.data = data
+        self.data = data  # значения записи в том виде, как их вернула база
         self.display_names = display_names or {}
-        self.date_columns = date_columns or []  # Список колонок с датами
+        self.column_info = column_info or {}  # имя столбца -> ColumnInfo
+        self.date_columns = [col for col in columns if col in self.column_info and self.column_info[col].is_date]
         self.setup_ui()
 
     def setup_ui(self):
@@ -392,14 +2595,12 @@ class EditDialog(QDialog):
             label = QLabel(label_text)
             self.layout.addWidget(label)
 
-            field = QLineEdit()
+            info = self.column_info.get(column)
+            field = self.make_field(info)
             if self.data and i < len(self.data):
-                # Если это колонка с датой, форматируем для отображения
-                if column in self.date_columns:
-                    formatted_date = DateValidator.format_date_for_display(str(self.data[i]))
-                    field.setText(formatted_date if formatted_date else str(self.data[i]))
-                else:
-                    field.setText(str(self.data[i]))
+                # Даты показываются в формате ДД.ММ.ГГГГ
+                formatter = info.formatter if info is not None else format_value
+                field.setText(formatter(self.data[i]))
             else:
                 field.setText("")  # Пустое значение для новой записи
 
@@ -423,6 +2624,22 @@ class EditDialog(QDialog):
 
         self.setLayout(self.layout)
 
+    def make_field(self, info):
+        """Поле ввода по типу столбца: длина строки и диапазон чисел ограничены так же, как в базе"""
+        field = QLineEdit()
+        if info is None:
+            return field
+        if info.max_length:
+            field.setMaxLength(info.max_length)
+        if info.integer_range and info.data_type != 'bigint':
+            # QIntValidator принимает только 32-битные числа
+            field.setValidator(QIntValidator(*info.integer_range, field))
+        if info.foreign_key:
+            field.setPlaceholderText(f"значение из {info.foreign_key[0]}.{info.foreign_key[1]}")
+        elif info.nullable:
+            field.setPlaceholderText("необязательно")
+        return field
+
     def validate_and_accept(self):
         """Проверяет валидность данных перед принятием"""
         # Проверяем даты
@@ -464,9 +2681,10 @@ class EditDialog(QDialog):
 class ExpertAddDialog(QDialog):
     """Диалоговое окно для добавления эксперта с кодами ГРНТИ"""
 
-    def __init__(self, parent=None, db_manager=None):
+    def __init__(self, parent=None, db_manager=None, prefetched=None):
         super().__init__(parent)
         self.db_manager = db_manager
+        self.prefetched = prefetched or {}  # Заранее загруженные справочники
         self.grnti_codes = []  # Список кодов ГРНТИ
         self.setup_ui()
 
@@ -492,7 +2710,7 @@ class ExpertAddDialog(QDialog):
         self.region_combo.setEditable(True)
         self.region_combo.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
         if self.db_manager:
-            regions = self.db_manager.get_regions()
+            regions = self.prefetched.get('regions') or self.db_manager.get_regions()
             self.region_combo.addItems(regions)
         expert_layout.addWidget(region_label)
         expert_layout.addWidget(self.region_combo)
@@ -500,7 +2718,7 @@ class ExpertAddDialog(QDialog):
         # Город
         city_label = QLabel("Город")
         if self.db_manager:
-            self.city_combo = CityComboBox(self.db_manager)
+            self.city_combo = CityComboBox(self.db_manager, cities=self.prefetched.get('cities'))
             # Добавляем подсказку
             city_hint = QLabel("Начните вводить название города (минимум 2 символа)")
             city_hint.setStyleSheet("color: gray; font-size: 10px;")
@@ -682,10 +2900,14 @@ class ExpertAddDialog(QDialog):
                     code_int = int(code)
                     subrubric_int = int(subrubric) if subrubric else None
                     discipline_int = int(discipline) if discipline else None
-                    self.grnti_codes.append((code_int, subrubric_int, discipline_int))
                 except ValueError:
                     QMessageBox.warning(self, "Ошибка", f"Код ГРНТИ в строке {row + 1} должен быть числом")
                     return
+                # Рубрика входит в первичный ключ expert_grnti (id, rubric)
+                if any(existing[0] == code_int for existing in self.grnti_codes):
+                    QMessageBox.warning(self, "Ошибка", f"Рубрика {code_int} указана несколько раз")
+                    return
+                self.grnti_codes.append((code_int, subrubric_int, discipline_int))
         
         self.accept()
 
@@ -717,9 +2939,10 @@ class ExpertAddDialog(QDialog):
 class ExpertEditDialog(QDialog):
     """Диалоговое окно для редактирования эксперта с кодами ГРНТИ"""
 
-    def __init__(self, expert_data, expert_id, parent=None, db_manager=None):
+    def __init__(self, expert_data, expert_id, parent=None, db_manager=None, prefetched=None):
         super().__init__(parent)
         self.db_manager = db_manager
+        self.prefetched = prefetched or {}  # Заранее загруженные справочники и коды ГРНТИ
         self.expert_id = expert_id
         self.expert_data = expert_data
         self.grnti_codes = []  # Список кодов ГРНТИ
@@ -749,7 +2972,7 @@ class ExpertEditDialog(QDialog):
         self.region_combo.setEditable(True)
         self.region_combo.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
         if self.db_manager:
-            regions = self.db_manager.get_regions()
+            regions = self.prefetched.get('regions') or self.db_manager.get_regions()
             self.region_combo.addItems(regions)
         expert_layout.addWidget(region_label)
         expert_layout.addWidget(self.region_combo)
@@ -757,7 +2980,7 @@ class ExpertEditDialog(QDialog):
         # Город
         city_label = QLabel("Город")
         if self.db_manager:
-            self.city_combo = CityComboBox(self.db_manager)
+            self.city_combo = CityComboBox(self.db_manager, cities=self.prefetched.get('cities'))
             # Добавляем подсказку
             city_hint = QLabel("Начните вводить название города (минимум 2 символа)")
             city_hint.setStyleSheet("color: gray; font-size: 10px;")
@@ -872,15 +3095,10 @@ class ExpertEditDialog(QDialog):
             return
             
         try:
-            cursor = self.db_manager.connection.cursor()
-            cursor.execute("""
-                SELECT rubric, subrubric, siscipline
-                FROM expert_grnti
-                WHERE id = %s
-            """, (self.expert_id,))
-            
-            existing_codes = cursor.fetchall()
-            cursor.close()
+            if 'grnti_codes' in self.prefetched:
+                existing_codes = self.prefetched['grnti_codes']
+            else:
+                existing_codes = self.db_manager.get_expert_grnti_codes(self.expert_id)
             
             # Добавляем существующие коды в таблицу
             for code, subrubric, discipline in existing_codes:
@@ -999,10 +3217,14 @@ class ExpertEditDialog(QDialog):
                     code_int = int(code)
                     subrubric_int = int(subrubric) if subrubric else None
                     discipline_int = int(discipline) if discipline else None
-                    self.grnti_codes.append((code_int, subrubric_int, discipline_int))
                 except ValueError:
                     QMessageBox.warning(self, "Ошибка", f"Код ГРНТИ в строке {row + 1} должен быть числом")
                     return
+                # Рубрика входит в первичный ключ expert_grnti (id, rubric)
+                if any(existing[0] == code_int for existing in self.grnti_codes):
+                    QMessageBox.warning(self, "Ошибка", f"Рубрика {code_int} указана несколько раз")
+                    return
+                self.grnti_codes.append((code_int, subrubric_int, discipline_int))
         
         self.accept()
 
@@ -1032,7 +3254,7 @@ class ExpertEditDialog(QDialog):
 
 
 class MainWindow(QMainWindow, Ui_MainWindow):
-    def __init__(self):
+    def __init__(self, use_async=False):
         super().__init__()
         self.setupUi(self)
         # self.check_layout()
@@ -1048,6 +3270,26 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         screen_geometry = screen.availableGeometry()
         self.resize(int(screen_geometry.width() * 0.8), int(screen_geometry.height() * 0.7))
         
+        # Таблица из формы (QTableWidget) заменяется представлением над моделью строк результата
+        self.table_model = ResultTableModel(self)
+        self.table_model.sort_handler = self.sort_by_column
+        self.table_model.fetch_handler = self.load_more_rows
+        self.table_view = QTableView(parent=self.centralwidget)
+        self.table_view.setObjectName("table_view")
+        self.table_view.setModel(self.table_model)
+        self.table_view.horizontalHeader().setStretchLastSection(True)
+        self.table_view.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.horizontalLayout.replaceWidget(self.table_widget, self.table_view)
+        self.table_widget.setParent(None)  # без родителя виджет удаляется вместе с последней ссылкой
+        del self.table_widget
+
+        # Дерево для общей таблицы по экспертам: коды ГРНТИ эксперта раскрываются по требованию
+        self.expert_tree = QTreeWidget(parent=self.centralwidget)
+        self.expert_tree.setUniformRowHeights(True)
+        self.expert_tree.setVisible(False)
+        self.expert_tree.itemExpanded.connect(self.on_tree_item_expanded)
+        self.horizontalLayout.addWidget(self.expert_tree)
+
         # Настройка сортировки таблицы
         self.setup_table_sorting()
 
@@ -1088,20 +3330,78 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 'grnti_description': 'Описание ГРНТИ',
                 'subrubric': 'Подрубрика',
                 'siscipline': 'Дисциплина'
+            },
+            'combined_experts': {
+                'expert_id': 'ID эксперта',
+                'expert_name': 'ФИО эксперта',
+                'region': 'Регион',
+                'city': 'Город',
+                'input_date': 'Дата добавления',
+                'grnti_codes': 'Код ГРНТИ',
+                'grnti_descriptions': 'Описание ГРНТИ',
+                'subrubrics': 'Подрубрика',
+                'disciplines': 'Дисциплина'
             }
         }
 
-        # Столбцы, содержащие даты (для преобразования формата)
-        self.date_columns = {
-            'expert': ['input_date'],
-            'combined': ['input_date'],
-            # Добавьте другие таблицы с датами по необходимости
+        # Скрытые столбцы-идентификаторы
+        self.hidden_columns = {
+            'expert': 'id',
+            'combined_experts': 'expert_id',
         }
 
+        # Форматирование значений каждого столбца текущего представления (по типу из каталога)
+        self.column_formatters = {}
+
+        # Асинхронное чтение (asyncpg) используется, только если цикл asyncio работает поверх Qt,
+        # иначе страницы читаются в пуле потоков (QueryWorker)
+        self.adb = None
+        self._page_task = None  # текущая загрузка страницы: задача asyncio или QueryWorker
+        self._count_task = None  # подсчет строк текущего представления (QueryWorker)
+
+        # Изменения, сделанные другими пользователями, приходят уведомлениями сервера
+        self.listener = None
+        # Ключи строк из уведомлений, которые еще не применены: {исходная таблица: множество ключей}.
+        # Обработка откладывается, чтобы серия уведомлений перечитала строки один раз
+        self._pending_changes = {}
+        self._patch_worker = None  # перечитывание измененных строк (QueryWorker)
+        self.patch_timer = QTimer(self)
+        self.patch_timer.setSingleShot(True)
+        self.patch_timer.setInterval(300)
+        self.patch_timer.timeout.connect(self.patch_rows)
+        # Изменения без ключей (TRUNCATE, массовые) требуют перечитать открытую таблицу
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(300)
+        self.reload_timer.timeout.connect(self.reload_view)
+
+        # Ширина столбцов оценивается по выборке строк и запоминается для каждого представления;
+        # при перетаскивании края окна столбцы пересчитываются один раз, когда размер перестал меняться
+        self.column_widths = {}
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(150)
+        self.resize_timer.timeout.connect(self.adaptive_resize_columns)
+
+        # Изменения, накопленные в table_change, периодически переносятся в table_version в фоне
+        self._collapse_task = None
+        self.collapse_timer = QTimer(self)
+        self.collapse_timer.setInterval(VERSIONS_COLLAPSE_INTERVAL * 1000)
+        self.collapse_timer.timeout.connect(self.collapse_table_versions)
 
         # Подключение к базе данных
         try:
             self.db = DatabaseManager()
+            self.db.collapse_table_versions()
+            if VERSIONS_COLLAPSE_INTERVAL > 0:
+                self.collapse_timer.start()
+            self.importer = DataImporter(self.db)
+            self.exporter = DataExporter(self.db)
+            if use_async and asyncpg is not None:
+                self.adb = AsyncDatabaseManager(self.db)
+            if LISTEN_CHANGES:
+                self.listener = ChangeListener(self)
+                self.listener.table_changed.connect(self.on_table_changed)
             self.connect_menu_actions()
             self.connect_button_actions()
             self.statusbar.showMessage("Подключение к базе данных успешно")
@@ -1111,175 +3411,626 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         # Текущая таблица
         self.current_table = None
+
+        # Состояние постраничной загрузки текущего представления
+        self.page_columns = []
+        self.page_order = None
+        self.next_page_key = None
+        self.first_page_limit = None
+        self._restore_scroll = None
+        self.row_keys = []  # ключи показанных строк (PageSource.key_exprs) в порядке строк
+        self.page_rows = ColumnarRows()  # значения показанных строк в том виде, как их вернула база
+        self.row_count = None  # (число строк представления, точное ли оно) - см. DatabaseManager.count_rows
         
-        # Переменные для сортировки
-        self.current_sort_column = -1
-        self.sort_ascending = True
+        # Сортировка: [(индекс показанного столбца, по возрастанию)], первый столбец - главный
+        self.sort_columns = []
 
     # def check_layout(self):
     #     """Проверка структуры layout"""
     #     print("Центральный виджет:", self.centralwidget)
     #     print("Layout центрального виджета:", self.centralwidget.layout())
-    #     print("Размер таблицы:", self.table_widget.size())
+    #     print("Размер таблицы:", self.table_view.size())
     #     print("Размер окна:", self.size())
 
-    def format_date(self, date_string):
-        """Преобразование даты в формат для отображения"""
-        if not date_string:
-            return ""
-        return DateValidator.format_date_for_display(date_string) or str(date_string)
-    
     def setup_table_sorting(self):
         """Настройка сортировки таблицы"""
-        # Включаем сортировку
-        self.table_widget.setSortingEnabled(True)
-        
-        # Подключаем обработчик клика по заголовкам
-        header = self.table_widget.horizontalHeader()
-        header.sectionClicked.connect(self.on_header_clicked)
-        
-        # Настраиваем заголовки для показа индикатора сортировки
-        header.setSortIndicatorShown(True)
+        # Сортирует сервер: встроенная сортировка Qt переставляла бы только загруженные строки
+        self.table_view.setSortingEnabled(False)
+        self.expert_tree.setSortingEnabled(False)
+
+        for view, header in ((self.table_view, self.table_view.horizontalHeader()),
+                             (self.expert_tree, self.expert_tree.header())):
+            # Подключаем обработчик клика по заголовкам
+            header.setSectionsClickable(True)
+            header.sectionClicked.connect(self.on_header_clicked)
+
+            # Настраиваем заголовки для показа индикатора сортировки
+            header.setSortIndicatorShown(True)
+
+        # Следующие страницы таблицы запрашивает сам QTableView (ResultTableModel.fetchMore),
+        # дерево подгружает их при прокрутке до конца
+        self.expert_tree.verticalScrollBar().valueChanged.connect(self.on_table_scrolled)
+
+    def is_tree_view(self):
+        """Текущее представление показывается деревом (общая таблица по экспертам)"""
+        return self.current_table == 'combined_experts'
+
+    def current_view(self):
+        """Виджет, в котором показано текущее представление"""
+        return self.expert_tree if self.is_tree_view() else self.table_view
+
+    def current_header(self):
+        if self.is_tree_view():
+            return self.expert_tree.header()
+        return self.table_view.horizontalHeader()
+
+    def loaded_row_count(self):
+        """Сколько строк текущего представления уже загружено"""
+        if self.is_tree_view():
+            return self.expert_tree.topLevelItemCount()
+        return self.table_model.rowCount()
+
+    def visible_columns(self, columns):
+        """Столбцы выборки, которые показываются пользователю (без скрытого идентификатора)"""
+        hidden = self.hidden_columns.get(self.current_table)
+        return [col for col in columns if col != hidden]
+
+    def update_sort_indicator(self):
+        """Показывает на заголовке главный столбец сортировки (или ее отсутствие)"""
+        column, ascending = self.sort_columns[0] if self.sort_columns else (-1, True)
+        self.current_header().setSortIndicator(
+            column, Qt.SortOrder.AscendingOrder if ascending else Qt.SortOrder.DescendingOrder
+        )
     
     def on_header_clicked(self, logical_index):
-        """Обработчик клика по заголовку столбца"""
+        """Обработчик клика по заголовку столбца; Shift+клик добавляет столбец к сортировке"""
         if not self.current_table:
             return
-            
-        # Если кликнули по тому же столбцу, меняем направление сортировки
-        if self.current_sort_column == logical_index:
-            self.sort_ascending = not self.sort_ascending
+
+        directions = dict(self.sort_columns)
+        if self.sort_columns and QApplication.keyboardModifiers() & Qt.KeyboardModifier.ShiftModifier:
+            # Новый столбец сортирует строки с равными значениями предыдущих,
+            # Shift+клик по столбцу сортировки меняет его направление
+            if logical_index in directions:
+                sort_columns = [(index, not ascending if index == logical_index else ascending)
+                                for index, ascending in self.sort_columns]
+            else:
+                sort_columns = self.sort_columns + [(logical_index, True)]
+            self.sort_by_columns(sort_columns)
+            return
+
+        # Если кликнули по тому же столбцу, меняем направление сортировки,
+        # по новому столбцу сортируем по возрастанию
+        if self.sort_columns and self.sort_columns[0][0] == logical_index:
+            ascending = not directions[logical_index]
         else:
-            # Если кликнули по новому столбцу, сортируем по возрастанию
-            self.sort_ascending = True
-            self.current_sort_column = logical_index
-        
+            ascending = True
+        self.sort_by_column(logical_index, ascending)
+
+    def sort_by_column(self, logical_index, ascending):
+        """Сортирует текущее представление по показанному столбцу (клик по заголовку, ResultTableModel.sort)"""
+        self.sort_by_columns([(logical_index, ascending)])
+
+    def sort_by_columns(self, sort_columns):
+        """Сортирует текущее представление по показанным столбцам [(индекс столбца, по возрастанию)]"""
+        if not self.current_table:
+            return
+
+        # По спискам кодов ГРНТИ (общая таблица по экспертам) сортировать нельзя
+        columns = self.visible_columns(self.page_columns)
+        sort_exprs = self.db.get_page_source(self.current_table).sort_exprs
+        if any(index >= len(columns) or columns[index] not in sort_exprs for index, _ in sort_columns):
+            self.update_sort_indicator()
+            return
+
+        self.sort_columns = list(sort_columns)
+
         # Выполняем сортировку
-        self.sort_table_data(logical_index, self.sort_ascending)
+        self.sort_table_data(self.sort_columns)
     
-    def sort_table_data(self, column_index, ascending=True):
-        """Сортировка данных таблицы по указанному столбцу"""
+    def sort_table_data(self, sort_columns):
+        """Сортировка данных таблицы по столбцам [(индекс столбца, по возрастанию)] (ORDER BY на сервере)"""
         if not self.current_table:
             return
             
         try:
-            # Получаем данные в зависимости от типа таблицы
-            if self.current_table == "combined":
-                data = self.db.get_combined_data()
-                columns = self.db.get_combined_columns()
-                db_column_index = column_index
-            else:
-                data = self.db.get_table_data(self.current_table)
-                columns = self.db.get_columns_names(self.current_table)
-                
-                # Определяем реальный индекс столбца в базе данных
-                # Учитываем, что для таблицы expert первый столбец (id) скрыт
-                if self.current_table == 'expert' and column_index >= 0:
-                    db_column_index = column_index + 1  # +1 потому что id скрыт
-                else:
-                    db_column_index = column_index
-            
-            if db_column_index >= len(columns):
+            columns = self.page_columns
+
+            # Определяем столбцы в базе данных с учетом скрытого идентификатора (id экспертов)
+            visible_columns = self.visible_columns(columns)
+            if any(index >= len(visible_columns) for index, _ in sort_columns):
                 return
-                
-            # Сортируем данные
-            sorted_data = sorted(data, key=lambda row: self.get_sort_key(row[db_column_index]), reverse=not ascending)
-            
-            # Обновляем таблицу с отсортированными данными
-            if self.current_table == "combined":
-                self.populate_combined_table_with_data(sorted_data, columns)
-            else:
-                self.populate_table_with_data(sorted_data, columns)
+
+            # Заново читаем первую страницу уже в нужном порядке
+            order = tuple((visible_columns[index], ascending) for index, ascending in sort_columns)
+            self.load_table_page(self.current_table, columns, order=order)
             
             # Обновляем индикатор сортировки
-            header = self.table_widget.horizontalHeader()
-            header.setSortIndicator(column_index, Qt.SortOrder.AscendingOrder if ascending else Qt.SortOrder.DescendingOrder)
-            
-            self.statusbar.showMessage(f"Таблица отсортирована по столбцу {column_index + 1} ({'по возрастанию' if ascending else 'по убыванию'})")
+            self.update_sort_indicator()
             
         except Exception as e:
             QMessageBox.warning(self, "Ошибка сортировки", f"Не удалось отсортировать данные: {str(e)}")
     
-    def get_sort_key(self, value):
-        """Получает ключ для сортировки, обрабатывая разные типы данных"""
-        if value is None:
-            return (0, "")  # Возвращаем кортеж для правильной сортировки None значений
-        
-        # Пытаемся преобразовать в число
-        try:
-            if isinstance(value, (int, float)):
-                return (1, value)  # Числа имеют приоритет 1
-            # Пытаемся преобразовать строку в число
-            if isinstance(value, str):
-                # Убираем пробелы и проверяем, является ли строка числом
-                clean_value = value.strip()
-                if clean_value.replace('.', '').replace('-', '').replace('+', '').isdigit():
-                    return (1, float(clean_value))  # Числа имеют приоритет 1
-        except (ValueError, TypeError):
-            pass
-        
-        # Для дат пытаемся преобразовать в datetime для корректной сортировки
-        if hasattr(value, 'strftime'):
-            return (2, value)  # Даты имеют приоритет 2
-        
-        # Для строк проверяем, является ли это датой
-        date_obj = DateValidator.parse_date(str(value))
-        if date_obj:
-            return (2, date_obj)  # Даты имеют приоритет 2
-        
-        # Возвращаем строку в нижнем регистре для сортировки
-        return (3, str(value).lower())  # Строки имеют приоритет 3
-    
-    def populate_table_with_data(self, data, columns):
-        """Заполняет таблицу данными (используется для обновления после сортировки)"""
+    def setup_table_columns(self, columns):
+        """Очищает таблицу и выставляет заголовки с русскими названиями столбцов"""
         # Получаем русские названия столбцов
-        display_columns = []
-        for col in columns:
-            if self.current_table == 'expert' and col == 'id':
-                continue
-            if (self.current_table in self.column_display_names and
-                    col in self.column_display_names[self.current_table]):
-                display_columns.append(self.column_display_names[self.current_table][col])
+        display_names = self.column_display_names.get(self.current_table, {})
+        display_columns = [display_names.get(col, col) for col in self.visible_columns(columns)]
+
+        # Форматирование выбирается по типу столбца один раз на загрузку, а не для каждой ячейки
+        source = self.db.get_page_source(self.current_table)
+        self.column_formatters = {}
+        for col, info in self.db.get_column_info(self.current_table).items():
+            if info.is_text or col in source.display_dates:
+                # Текст (в том числе даты, отформатированные сервером) показывается как есть
+                self.column_formatters[col] = format_value
             else:
-                display_columns.append(col)
-        
+                self.column_formatters[col] = memoize_formatter(info.formatter)
+
+        # Показываем таблицу или дерево в зависимости от представления
+        tree_view = self.is_tree_view()
+        self.table_view.setVisible(not tree_view)
+        self.expert_tree.setVisible(tree_view)
+
         # Настраиваем таблицу
-        self.table_widget.setColumnCount(len(display_columns))
-        self.table_widget.setHorizontalHeaderLabels(display_columns)
-        self.table_widget.setRowCount(len(data))
-        
-        # Заполняем таблицу данными
-        date_columns = self.date_columns.get(self.current_table, [])
-        
-        for row_num, row_data in enumerate(data):
-            col_num_display = 0
-            for col_num, value in enumerate(row_data):
-                col_name = columns[col_num]
-                
-                if self.current_table == 'expert' and col_name == 'id':
+        if tree_view:
+            self.expert_tree.clear()
+            self.expert_tree.setColumnCount(len(display_columns))
+            self.expert_tree.setHeaderLabels(display_columns)
+        else:
+            self.table_model.reset(self.page_rows, columns, self.visible_columns(columns), display_columns,
+                                   [self.column_formatters.get(col, format_value) for col in columns])
+
+    def format_cell(self, col_name, value):
+        """Текст ячейки: даты в формате ДД.ММ.ГГГГ, пустые значения - пустая строка"""
+        return self.column_formatters.get(col_name, format_value)(value)
+
+    def append_table_rows(self, data, columns):
+        """Дописывает строки в конец таблицы (и в page_rows)"""
+        if self.is_tree_view():
+            self.append_tree_rows(data, columns)
+            return
+        # Модель хранит строки как есть, текст ячеек строится только при отрисовке
+        self.table_model.append_rows(data)
+
+    def append_tree_rows(self, data, columns):
+        """Дописывает экспертов в дерево. Строки кодов ГРНТИ создаются только при раскрытии эксперта"""
+        self.expert_tree.addTopLevelItems([self.make_tree_item(row_data, columns) for row_data in data])
+        self.page_rows.extend(data)
+
+    def make_tree_item(self, row_data, columns):
+        """Строка эксперта в дереве; его коды ГРНТИ сохраняются в ней до раскрытия"""
+        values = []
+        for col_name in self.visible_columns(columns):
+            value = row_data[columns.index(col_name)]
+            if col_name == 'grnti_codes':
+                # В строке эксперта - перечень его рубрик
+                values.append(", ".join(str(code) for code in value or []))
+            elif col_name in COMPACT_COMBINED_CODE_COLUMNS:
+                values.append("")
+            else:
+                values.append(self.format_cell(col_name, value))
+        item = QTreeWidgetItem(values)
+
+        if row_data[columns.index('grnti_codes')]:
+            # Коды ГРНТИ (код, описание, подрубрика, дисциплина) ждут раскрытия
+            code_columns = [row_data[columns.index(col)] for col in COMPACT_COMBINED_CODE_COLUMNS]
+            item.setData(0, Qt.ItemDataRole.UserRole, list(zip(*code_columns)))
+            item.setChildIndicatorPolicy(QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator)
+        return item
+
+    def replace_row(self, index, row_data):
+        """Заменяет показанную строку текущего представления"""
+        if self.is_tree_view():
+            item = self.make_tree_item(row_data, self.page_columns)
+            old_item = self.expert_tree.takeTopLevelItem(index)
+            self.expert_tree.insertTopLevelItem(index, item)
+            if old_item is not None and old_item.isExpanded():
+                item.setExpanded(True)
+            self.page_rows[index] = row_data
+        else:
+            self.table_model.replace_row(index, row_data)
+
+    def insert_row(self, index, row_data, row_key):
+        """Вставляет строку в текущее представление перед строкой index"""
+        if self.is_tree_view():
+            self.expert_tree.insertTopLevelItem(index, self.make_tree_item(row_data, self.page_columns))
+            self.page_rows.insert(index, row_data)
+        else:
+            self.table_model.insert_row(index, row_data)
+        self.row_keys.insert(index, row_key)
+
+    def remove_row(self, index):
+        """Убирает строку из текущего представления"""
+        if self.is_tree_view():
+            self.expert_tree.takeTopLevelItem(index)
+            del self.page_rows[index]
+        else:
+            self.table_model.remove_row(index)
+        del self.row_keys[index]
+
+    def on_tree_item_expanded(self, item):
+        """Создает строки кодов ГРНТИ эксперта при первом раскрытии"""
+        codes = item.data(0, Qt.ItemDataRole.UserRole)
+        if not codes or item.childCount():
+            return
+        visible = self.visible_columns(self.page_columns)
+        children = []
+        for code in codes:
+            values = dict(zip(COMPACT_COMBINED_CODE_COLUMNS, code))
+            children.append(QTreeWidgetItem([self.format_cell(col, values.get(col)) for col in visible]))
+        item.addChildren(children)
+
+    def finish_table_population(self):
+        """Подгоняет ширину столбцов под загруженные данные"""
+        self.setup_adaptive_columns()
+
+    def current_column_count(self):
+        if self.is_tree_view():
+            return self.expert_tree.columnCount()
+        return self.table_model.columnCount()
+
+    def estimate_column_widths(self):
+        """Ширина столбцов по заголовку и не более чем COLUMN_WIDTH_SAMPLE загруженным строкам.
+
+        Строки выборки берутся равномерно по загруженным; оценка запоминается для представления,
+        если в нем есть строки.
+        """
+        column_count = self.current_column_count()
+        if self.is_tree_view():
+            row_count = self.expert_tree.topLevelItemCount()
+            headers = [self.expert_tree.headerItem().text(column) for column in range(column_count)]
+            cell_text = lambda row, column: self.expert_tree.topLevelItem(row).text(column)
+        else:
+            row_count = self.table_model.rowCount()
+            headers = [self.table_model.headerData(column, Qt.Orientation.Horizontal) or ""
+                       for column in range(column_count)]
+            cell_text = lambda row, column: self.table_model.index(row, column).data()
+        sample = range(0, row_count, max(1, row_count // COLUMN_WIDTH_SAMPLE))[:COLUMN_WIDTH_SAMPLE]
+
+        view = self.current_view()
+        metrics = view.fontMetrics()
+        header_metrics = self.current_header().fontMetrics()
+        widths = []
+        for column in range(column_count):
+            # Место под отступы ячейки и под индикатор сортировки в заголовке
+            width = max([header_metrics.horizontalAdvance(headers[column]) + 24] +
+                        [metrics.horizontalAdvance(cell_text(row, column)) + 12 for row in sample])
+            widths.append(width)
+        if self.is_tree_view() and widths:
+            widths[0] += self.expert_tree.indentation()  # значок раскрытия эксперта
+
+        if row_count:
+            self.column_widths[self.current_table] = widths
+        return widths
+
+    def load_table_page(self, table_name, columns, order=None, limit=None, restore_scroll=None):
+        """Показывает первую страницу таблицы; следующие подгружаются при прокрутке вниз.
+
+        limit - размер первой страницы (по умолчанию PAGE_SIZE);
+        restore_scroll - положение прокрутки, которое нужно восстановить после загрузки.
+        """
+        self.page_columns = columns
+        self.page_order = order
+        self.next_page_key = None
+        self.first_page_limit = limit
+        self._restore_scroll = restore_scroll
+        self.row_keys = []
+        self.page_rows = ColumnarRows()  # строки табличного представления хранит модель (тот же объект)
+        # Загрузка прочитает строки уже после изменений из уведомлений
+        self._pending_changes = {}
+        self._patch_worker = None
+        self.setup_table_columns(columns)
+        self.load_next_page(first_page=True)
+        self.load_row_count()
+
+    def load_next_page(self, first_page=False):
+        """Загружает следующую страницу текущего представления в фоне"""
+        if not self.current_table or (not first_page and self.next_page_key is None):
+            return
+
+        if self._page_task is not None:
+            if not first_page:
+                return  # следующая страница уже загружается
+            # Новое представление отменяет незавершенную загрузку предыдущего вместе с запросом на сервере
+            self._page_task.cancel()
+            self._page_task = None
+
+        limit = self.first_page_limit if first_page else None
+        if self.adb:
+            task = asyncio.ensure_future(
+                self.adb.get_page(self.current_table, self.next_page_key, limit=limit, order=self.page_order)
+            )
+            task.add_done_callback(lambda done: self.on_page_task_done(done, first_page))
+        else:
+            task = QueryWorker(self.db.get_page, self.current_table, self.next_page_key,
+                               limit=limit, order=self.page_order)
+            task.signals.finished.connect(lambda page: self.on_page_loaded(task, page, first_page))
+            task.signals.failed.connect(lambda error: self.on_page_failed(task, error))
+            QThreadPool.globalInstance().start(task)
+        self._page_task = task
+
+    def load_row_count(self):
+        """Считает строки текущего представления в фоне (для строки состояния)"""
+        if self._count_task is not None:
+            self._count_task.cancel()
+        self.row_count = None
+        view = self.current_table
+        task = QueryWorker(self.db.count_rows, view)
+        task.signals.finished.connect(lambda row_count: self.on_row_count_loaded(task, row_count))
+        task.signals.failed.connect(lambda error: self.on_row_count_failed(task, error))
+        QThreadPool.globalInstance().start(task)
+        self._count_task = task
+
+    def on_row_count_loaded(self, task, row_count):
+        if task is not self._count_task:
+            return
+        self._count_task = None
+        self.row_count = row_count
+        if self._page_task is None:
+            self.show_page_status()
+
+    def on_row_count_failed(self, task, error):
+        # Без числа строк строка состояния показывает только загруженные
+        if task is self._count_task:
+            self._count_task = None
+        print(f"Не удалось подсчитать строки: {error}")
+
+    def adjust_row_count(self, delta):
+        """Учитывает добавленные (delta > 0) или удаленные строки в подсчитанном числе строк"""
+        if self.row_count is not None:
+            count, exact = self.row_count
+            self.row_count = (max(count + delta, 0), exact)
+
+    def on_page_task_done(self, task, first_page):
+        """Передает результат асинхронной загрузки страницы"""
+        if task.cancelled():
+            return
+        if task.exception():
+            self.on_page_failed(task, task.exception())
+        else:
+            self.on_page_loaded(task, task.result(), first_page)
+
+    def on_page_loaded(self, task, page, first_page):
+        """Показывает загруженную страницу"""
+        # Результат уже замененной загрузки не должен попасть в другую таблицу
+        if task is not self._page_task:
+            return
+        self._page_task = None
+        self.apply_page(page, first_page)
+
+    def on_page_failed(self, task, error):
+        """Сообщает об ошибке загрузки страницы"""
+        if task is not self._page_task:
+            return
+        self._page_task = None
+        self.next_page_key = None
+        self.table_model.more_available = False
+        QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить данные: {str(error)}")
+
+    def apply_page(self, page, first_page):
+        """Дописывает страницу в таблицу и обновляет строку состояния"""
+        self.next_page_key = page.next_key
+        self.append_table_rows(page.rows, self.page_columns)
+        self.row_keys.extend(page.row_keys)
+        self.table_model.more_available = page.has_more
+        if first_page:
+            # Ширину столбцов подбираем по первой странице
+            self.finish_table_population()
+            if self._restore_scroll is not None:
+                scroll_value, self._restore_scroll = self._restore_scroll, None
+                QTimer.singleShot(0, lambda: self.current_view().verticalScrollBar().setValue(scroll_value))
+
+        self.show_page_status()
+        if page.has_more and self.is_tree_view():
+            # Диапазон прокрутки пересчитывается после обработки событий, проверяем его потом
+            QTimer.singleShot(0, self.fill_viewport)
+
+    def show_page_status(self):
+        """Строка состояния: представление, сортировка и сколько строк загружено из скольких"""
+        if self.current_table == "combined":
+            message = "Загружена объединенная таблица"
+        elif self.current_table == "combined_experts":
+            message = "Загружена объединенная таблица по экспертам"
+        else:
+            message = f"Загружена таблица: {self.current_table}"
+        if self.sort_columns:
+            parts = [f"{index + 1} ({'по возрастанию' if ascending else 'по убыванию'})"
+                     for index, ascending in self.sort_columns]
+            message += f", сортировка по {'столбцу' if len(parts) == 1 else 'столбцам'} {', '.join(parts)}"
+        if self.next_page_key is not None:
+            total = ""
+            if self.row_count is not None:
+                count, exact = self.row_count
+                total = f" из {count}" if exact else f" из ~{count}"
+            self.statusbar.showMessage(f"{message}. Показано записей: {self.loaded_row_count()}{total} "
+                                       f"(прокрутите вниз, чтобы загрузить еще)")
+        else:
+            self.statusbar.showMessage(f"{message}. Записей: {self.loaded_row_count()}")
+
+    def collapse_table_versions(self):
+        """Запускает перенос строк table_change в фоне, если предыдущий уже закончился"""
+        if self._collapse_task is not None:
+            return
+        task = QueryWorker(self.db.collapse_table_versions)
+        task.signals.finished.connect(lambda _: self.on_collapse_done(task))
+        task.signals.failed.connect(lambda _: self.on_collapse_done(task))
+        self._collapse_task = task
+        QThreadPool.globalInstance().start(task)
+
+    def on_collapse_done(self, task):
+        if task is self._collapse_task:
+            self._collapse_task = None
+
+    def on_table_changed(self, table, op, keys, pid):
+        """Применяет к открытой таблице изменения из уведомления сервера"""
+        if table is None:
+            # Уведомления могли быть пропущены - ничему из прочитанного доверять нельзя
+            self.db.result_cache.clear()
+        else:
+            self.db.invalidate_cached(table)
+            if self.db.owns_backend(pid):
+                return  # свое изменение окно уже показало
+
+        if not self.current_table:
+            return
+        if table is not None and table not in self.db.get_view_sources(self.current_table):
+            return
+
+        filters = CHANGED_ROW_FILTERS.get(self.current_table, {})
+        if keys is None or table not in filters:
+            self.reload_timer.start()
+            return
+        if len(filters[table][0]) > 1:
+            keys = [tuple(key) for key in keys]
+        # Строку с пустым значением ключа не выбрать условием равенства
+        if any(key is None or (isinstance(key, tuple) and None in key) for key in keys):
+            self.reload_timer.start()
+            return
+        self._pending_changes.setdefault(table, set()).update(keys)
+        self.patch_timer.start()
+
+    def patch_rows(self):
+        """Перечитывает в фоне строки из накопленных уведомлений, чтобы заменить их в таблице на месте"""
+        if not self._pending_changes or not self.current_table:
+            return
+        if self._patch_worker is not None or self._page_task is not None:
+            # Места строк считаются по загруженным строкам: ждем, пока они перестанут меняться
+            self.patch_timer.start()
+            return
+        view = self.current_table
+        changes, self._pending_changes = self._pending_changes, {}
+        loaded = (self.loaded_row_count(), self.next_page_key)
+        worker = QueryWorker(self.db.locate_changed_rows, view, changes, self.page_order,
+                             limit=loaded[0], next_key=loaded[1])
+        worker.signals.finished.connect(lambda located: self.apply_row_patch(worker, view, changes, loaded, located))
+        worker.signals.failed.connect(lambda error: self.on_row_patch_failed(worker, error))
+        self._patch_worker = worker
+        QThreadPool.globalInstance().start(worker)
+
+    def apply_row_patch(self, worker, view, changes, loaded, located):
+        """Убирает затронутые изменениями строки и ставит перечитанные на их места в текущей сортировке"""
+        if worker is not self._patch_worker:
+            return
+        self._patch_worker = None
+        if view != self.current_table:
+            return
+        if located is None:
+            self.reload_timer.start()
+            return
+        if self._page_task is not None or loaded != (self.loaded_row_count(), self.next_page_key):
+            # Пока строки перечитывались, загрузилась страница или изменилась строка: места устарели
+            for table, keys in changes.items():
+                self._pending_changes.setdefault(table, set()).update(keys)
+            self.patch_timer.start()
+            return
+
+        affected = self.changed_row_indexes(view, changes)
+        if [index for index, _ in affected] == [position for position, _, _ in located] and \
+                [self.row_keys[index] for index, _ in affected] == [row_key for _, _, row_key in located]:
+            # Строки остались на своих местах
+            for position, row_data, _ in located:
+                self.replace_row(position, row_data)
+            return
+
+        for index, _ in reversed(affected):
+            self.remove_row(index)
+        for position, row_data, row_key in located:
+            self.insert_row(min(position, len(self.row_keys)), row_data, row_key)
+        self.adjust_row_count(len(located) - len(affected))
+        self.show_page_status()
+
+    def changed_row_indexes(self, view, changes):
+        """Загруженные строки, в столбцах которых лежат ключи из changes: [(номер, ключ строки)]"""
+        columns = self.page_columns
+        matchers = []
+        for table, keys in changes.items():
+            key_columns, _ = CHANGED_ROW_FILTERS[view][table]
+            matchers.append(([columns.index(column) for column in key_columns], keys))
+
+        def matches(index):
+            for positions, keys in matchers:
+                if len(positions) > 1:
+                    if tuple(self.page_rows.value(index, position) for position in positions) in keys:
+                        return True
                     continue
-                
-                # Форматируем даты
-                if col_name in date_columns and value is not None:
-                    if hasattr(value, 'strftime'):
-                        value = value.strftime('%d.%m.%Y')
-                    else:
-                        value = self.format_date(str(value))
-                else:
-                    value = str(value) if value is not None else ""
-                
-                item = QTableWidgetItem(value)
-                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                self.table_widget.setItem(row_num, col_num_display, item)
-                col_num_display += 1
-        
-        # Автоматическая настройка ширины столбцов
-        self.table_widget.resizeColumnsToContents()
-        
-        # Устанавливаем растягивание
-        header = self.table_widget.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-    
+                value = self.page_rows.value(index, positions[0])
+                if isinstance(value, list):
+                    if any(item in keys for item in value):
+                        return True
+                elif value in keys:
+                    return True
+            return False
+
+        return [(index, self.row_keys[index]) for index in range(len(self.row_keys)) if matches(index)]
+
+    def on_row_patch_failed(self, worker, error):
+        if worker is self._patch_worker:
+            self._patch_worker = None
+        print(f"Не удалось перечитать измененные строки: {error}")
+
+    def show_changed_row(self, old_key, row_data, row_key):
+        """Показывает результат своего изменения без перечитывания таблицы.
+
+        old_key - ключ измененной или удаленной строки до изменения (None для новой);
+        row_data, row_key - строка после изменения и ее ключ или None, если она удалена.
+        Строка встает на свое место в текущей сортировке, прокрутка не сбрасывается.
+        """
+        if self._page_task is not None and self.next_page_key is None:
+            return  # первая страница еще загружается и уже покажет изменение
+        # Пока был открыт диалог, строки могли сдвинуться, поэтому строка ищется по ключу
+        index = self.row_keys.index(old_key) if old_key in self.row_keys else None
+        if old_key is None or row_data is None:
+            self.adjust_row_count(1 if old_key is None else -1)
+        if row_data is None:
+            if index is not None:
+                self.remove_row(index)
+            self.show_page_status()
+            return
+
+        # Сервер сравнивает строки так же, как при сортировке страниц (регистр, NULL, collation)
+        position = self.db.get_row_position(self.current_table, row_data, row_key, self.page_order,
+                                            limit=self.loaded_row_count(), next_key=self.next_page_key)
+        if index is not None:
+            if position == index:
+                self.replace_row(index, row_data)
+                self.row_keys[index] = row_key
+                return
+            self.remove_row(index)
+        if position is not None:
+            # Строка после загруженных страниц появится при прокрутке
+            self.insert_row(min(position, len(self.row_keys)), row_data, row_key)
+        self.show_page_status()
+
+    def reload_view(self):
+        """Перечитывает загруженные строки текущего представления, сохраняя положение прокрутки"""
+        if not self.current_table:
+            return
+        self.load_table_page(self.current_table, self.page_columns, self.page_order,
+                             limit=max(self.loaded_row_count(), PAGE_SIZE),
+                             restore_scroll=self.current_view().verticalScrollBar().value())
+
+    def load_more_rows(self):
+        """Догружает следующую страницу, показывая ошибку вместо исключения в обработчике Qt"""
+        if self.next_page_key is None:
+            return
+        try:
+            self.load_next_page()
+        except Exception as e:
+            self.next_page_key = None
+            self.table_model.more_available = False
+            QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить данные: {str(e)}")
+
+    def fill_viewport(self):
+        """Догружает страницы, пока дерево целиком помещается в окно и прокручивать нечего"""
+        if self.current_view().verticalScrollBar().maximum() == 0:
+            self.load_more_rows()
+
+    def on_table_scrolled(self, value):
+        """Подгружает следующую страницу, когда прокрутка дошла до конца дерева"""
+        if value >= self.current_view().verticalScrollBar().maximum():
+            self.load_more_rows()
+
     def connect_menu_actions(self):
         """Связываем пункты меню с соответствующими таблицами"""
         # Связываем действие "Эксперты" с таблицей expert
@@ -1304,6 +4055,16 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.actionHelp.triggered.connect(self.show_help)
         self.actionAbout.triggered.connect(self.show_about)
 
+        # Пункты меню, которых нет в форме
+        self.actionCombinedExperts = self.menu.addAction("Общая таблица по экспертам")
+        self.actionCombinedExperts.triggered.connect(self.show_combined_experts_table)
+
+        self.menu.addSeparator()
+        self.actionImport = self.menu.addAction("Импорт из файла...")
+        self.actionImport.triggered.connect(self.import_data)
+        self.actionExport = self.menu.addAction("Экспорт текущей таблицы...")
+        self.actionExport.triggered.connect(self.export_data)
+
     def connect_button_actions(self):
         """Связываем кнопки с функциями"""
         self.addButton.clicked.connect(self.add_record)
@@ -1314,22 +4075,16 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         """Отображение содержимого таблицы"""
         try:
             self.current_table = table_name
-            data = self.db.get_table_data(table_name)
             columns = self.db.get_columns_names(table_name)
 
             # Сбрасываем состояние сортировки при загрузке новой таблицы
-            self.current_sort_column = -1
-            self.sort_ascending = True
-
-            self.table_widget.clear()
+            self.sort_columns = []
 
-            # Используем новый метод для заполнения таблицы
-            self.populate_table_with_data(data, columns)
-
-            self.statusbar.showMessage(f"Загружена таблица: {table_name}. Записей: {len(data)}")
+            # Загружаем только первую страницу, остальные - по мере прокрутки
+            self.load_table_page(table_name, columns)
 
             # Принудительное обновление геометрии
-            self.table_widget.updateGeometry()
+            self.table_view.updateGeometry()
             self.centralwidget.updateGeometry()
 
         except Exception as e:
@@ -1339,69 +4094,136 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         """Отображение объединенной таблицы с данными из всех таблиц"""
         try:
             self.current_table = "combined"
-            data = self.db.get_combined_data()
             columns = self.db.get_combined_columns()
 
             # Сбрасываем состояние сортировки при загрузке новой таблицы
-            self.current_sort_column = -1
-            self.sort_ascending = True
-
-            self.table_widget.clear()
+            self.sort_columns = []
 
-            # Используем метод для заполнения таблицы
-            self.populate_combined_table_with_data(data, columns)
-
-            self.statusbar.showMessage(f"Загружена объединенная таблица. Записей: {len(data)}")
+            # Загружаем только первую страницу, остальные - по мере прокрутки
+            self.load_table_page("combined", columns, order=(("expert_name", True),))
 
             # Принудительное обновление геометрии
-            self.table_widget.updateGeometry()
+            self.table_view.updateGeometry()
             self.centralwidget.updateGeometry()
 
         except Exception as e:
             QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить объединенную таблицу: {str(e)}")
 
-    def populate_combined_table_with_data(self, data, columns):
-        """Заполняет таблицу объединенными данными"""
-        # Получаем русские названия столбцов
-        display_columns = []
-        for col in columns:
-            if (self.current_table in self.column_display_names and
-                    col in self.column_display_names[self.current_table]):
-                display_columns.append(self.column_display_names[self.current_table][col])
-            else:
-                display_columns.append(col)
+    def show_combined_experts_table(self):
+        """Объединенная таблица по строке на эксперта; коды ГРНТИ раскрываются в дереве"""
+        try:
+            self.current_table = "combined_experts"
+            columns = self.db.get_page_source("combined_experts").columns
 
-        # Настраиваем таблицу
-        self.table_widget.setColumnCount(len(display_columns))
-        self.table_widget.setHorizontalHeaderLabels(display_columns)
-        self.table_widget.setRowCount(len(data))
+            # Сбрасываем состояние сортировки при загрузке новой таблицы
+            self.sort_columns = []
 
-        # Заполняем таблицу данными
-        date_columns = self.date_columns.get(self.current_table, [])
+            self.load_table_page("combined_experts", columns, order=(("expert_name", True),))
+        except Exception as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить объединенную таблицу: {str(e)}")
 
-        for row_num, row_data in enumerate(data):
-            for col_num, value in enumerate(row_data):
-                col_name = columns[col_num]
+    def import_data(self):
+        """Массовый импорт записей из CSV/XLSX в выбранную таблицу"""
+        titles = {
+            'expert': "Эксперты",
+            'expert_grnti': "Эксперт-КОД",
+            'grnti_classifier': "ГРНТИ",
+            'reg_obl_city': "Регионы",
+        }
+        current = list(titles).index(self.current_table) if self.current_table in titles else 0
+        title, ok = QInputDialog.getItem(self, "Импорт", "Таблица для загрузки:",
+                                         list(titles.values()), current, False)
+        if not ok:
+            return
+        table_name = next(name for name, text in titles.items() if text == title)
 
-                # Форматируем даты
-                if col_name in date_columns and value is not None:
-                    if hasattr(value, 'strftime'):
-                        value = value.strftime('%d.%m.%Y')
-                    else:
-                        value = self.format_date(str(value))
-                else:
-                    value = str(value) if value is not None else ""
+        path, _ = QFileDialog.getOpenFileName(self, "Файл для импорта", "",
+                                              "Таблицы (*.csv *.xlsx);;CSV (*.csv);;Excel (*.xlsx)")
+        if not path:
+            return
+
+        progress = QProgressDialog("Импорт данных...", "Отмена", 0, 0, self)
+        progress.setWindowTitle("Импорт")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def on_progress(count):
+            progress.setLabelText(f"Обработано строк: {count}")
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        try:
+            result = self.importer.import_file(
+                table_name, path,
+                display_names=self.column_display_names.get(table_name, {}),
+                progress_callback=on_progress
+            )
+        except ImportCancelled:
+            self.statusbar.showMessage("Импорт отменен, изменения не сохранены")
+            return
+        except Exception as e:
+            QMessageBox.warning(self, "Ошибка импорта", f"Не удалось импортировать файл: {str(e)}")
+            return
+        finally:
+            progress.close()
+
+        message = (f"Прочитано строк: {result.total}\n"
+                   f"Загружено в таблицу: {result.merged}\n"
+                   f"Отклонено: {len(result.rejected)}")
+        if result.rejected:
+            rejected_path = os.path.splitext(path)[0] + "_rejected.csv"
+            try:
+                result.write_rejected(rejected_path)
+                message += f"\n\nОтклоненные строки с причинами сохранены в файл:\n{rejected_path}"
+            except OSError as e:
+                message += f"\n\nНе удалось сохранить отклоненные строки: {e}"
+        QMessageBox.information(self, "Импорт завершен", message)
+
+        if self.current_table == table_name:
+            self.show_table(table_name)
+
+    def export_data(self):
+        """Выгрузка открытой таблицы в CSV, XLSX или Parquet в текущем порядке сортировки"""
+        if not self.current_table:
+            QMessageBox.warning(self, "Ошибка", "Сначала выберите таблицу")
+            return
 
-                item = QTableWidgetItem(value)
-                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                self.table_widget.setItem(row_num, col_num, item)
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Экспорт таблицы", self.current_table,
+            "CSV (*.csv);;Excel (*.xlsx);;Parquet (*.parquet)"
+        )
+        if not path:
+            return
+        if os.path.splitext(path)[1].lower() not in DataExporter.FORMATS:
+            # Расширение не указано - берем его из выбранного фильтра
+            path += selected_filter[selected_filter.index('*.') + 1:-1]
+
+        progress = QProgressDialog("Экспорт данных...", None, 0, 0, self)
+        progress.setWindowTitle("Экспорт")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def on_progress(count):
+            progress.setLabelText(f"Выгружено строк: {count}")
+            QApplication.processEvents()
 
-        # Автоматическая настройка ширины столбцов
-        self.table_widget.resizeColumnsToContents()
+        # Таблица по экспертам выгружается развернутой: строка на каждый код ГРНТИ
+        table_name = "combined" if self.current_table == "combined_experts" else self.current_table
+
+        try:
+            count = self.exporter.export(
+                table_name, path,
+                display_names=self.column_display_names.get(table_name, {}),
+                order=self.page_order,
+                progress_callback=on_progress
+            )
+        except Exception as e:
+            QMessageBox.warning(self, "Ошибка экспорта", f"Не удалось выгрузить таблицу: {str(e)}")
+            return
+        finally:
+            progress.close()
 
-        # Устанавливаем растягивание
-        header = self.table_widget.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.statusbar.showMessage(f"Выгружено записей: {count} в файл {path}")
 
     def show_groups_info(self):
         """Показать информацию о группах"""
@@ -1448,24 +4270,25 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     def setup_adaptive_columns(self):
         """Настройка адаптивного поведения столбцов"""
-        if not hasattr(self, 'table_widget') or self.table_widget.columnCount() == 0:
+        column_count = self.current_column_count()
+        if not self.current_table or column_count == 0:
             return
 
-        header = self.table_widget.horizontalHeader()
-
-        # Сначала подгоняем по содержимому
-        self.table_widget.resizeColumnsToContents()
-
-        # Проверяем общую ширину столбцов
-        total_columns_width = sum([self.table_widget.columnWidth(i) for i in range(self.table_widget.columnCount())])
-        available_width = self.table_widget.viewport().width()
+        # Ширина по содержимому оценивается один раз для представления, а не по всем строкам
+        widths = self.column_widths.get(self.current_table)
+        if widths is None or len(widths) != column_count:
+            widths = self.estimate_column_widths()
 
-        # Если столбцы уже занимают всю ширину или больше, оставляем как есть
-        if total_columns_width >= available_width:
-            header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
-        else:
+        header = self.current_header()
+        if not self.is_tree_view() and sum(widths) < self.table_view.viewport().width():
             # Если есть свободное место, растягиваем столбцы
             header.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+            return
+
+        # Если столбцы не помещаются - включаем прокрутку
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        for column, width in enumerate(widths):
+            header.resizeSection(column, width)
 
     def add_record(self):
         """Добавить новую запись"""
@@ -1476,19 +4299,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         try:
             # Специальная обработка для таблицы expert
             if self.current_table == "expert":
-                dialog = ExpertAddDialog(self, self.db)
-                if dialog.exec():
-                    expert_data = dialog.get_expert_data()
-                    grnti_codes = dialog.get_grnti_codes()
-                    
-                    expert_id = self.db.insert_expert_with_grnti(expert_data, grnti_codes)
-                    self.show_table(self.current_table)
-                    self.statusbar.showMessage(f"Эксперт успешно добавлен с ID: {expert_id}")
+                self.open_expert_dialog(None, self.add_expert)
             else:
                 # Обычная обработка для других таблиц
                 columns = self.db.get_columns_names(self.current_table)
                 display_names = self.column_display_names.get(self.current_table, {})
-                date_columns = self.date_columns.get(self.current_table, [])
 
                 dialog = EditDialog(
                     self.current_table,
@@ -1496,69 +4311,97 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     data=None,
                     parent=self,
                     display_names=display_names,
-                    date_columns=date_columns
+                    column_info=self.db.get_column_info(self.current_table)
                 )
 
                 if dialog.exec():
                     data = dialog.get_data()
-                    self.db.insert_record(self.current_table, data)
-                    self.show_table(self.current_table)
+                    row_data, row_key = self.db.insert_record(self.current_table, data)
+                    self.show_changed_row(None, row_data, row_key)
                     self.statusbar.showMessage("Запись успешно добавлена")
         except Exception as e:
             QMessageBox.warning(self, "Ошибка", f"Не удалось добавить запись: {str(e)}")
             print(f"Ошибка при добавлении: {e}")
 
+    def open_expert_dialog(self, expert_id, open_dialog):
+        """Открывает диалог эксперта; в асинхронном режиме справочники загружаются заранее и параллельно"""
+        if not self.adb:
+            open_dialog(None)
+            return
+
+        def on_loaded(task):
+            if task.cancelled():
+                return
+            if task.exception():
+                QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить справочники: {str(task.exception())}")
+                return
+            # Модальный диалог запускаем из цикла Qt, а не из обработчика asyncio
+            QTimer.singleShot(0, lambda: open_dialog(task.result()))
+
+        self.statusbar.showMessage("Загрузка справочников...")
+        asyncio.ensure_future(self.adb.get_expert_dialog_data(expert_id)).add_done_callback(on_loaded)
+
+    def add_expert(self, prefetched=None):
+        """Добавить эксперта вместе с кодами ГРНТИ"""
+        try:
+            dialog = ExpertAddDialog(self, self.db, prefetched)
+            if dialog.exec():
+                expert_data = dialog.get_expert_data()
+                grnti_codes = dialog.get_grnti_codes()
+
+                row_data, row_key = self.db.insert_expert_with_grnti(expert_data, grnti_codes)
+                self.show_changed_row(None, row_data, row_key)
+                self.statusbar.showMessage(f"Эксперт успешно добавлен с ID: {row_data[0]}")
+        except Exception as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось добавить эксперта: {str(e)}")
+            print(f"Ошибка при добавлении: {e}")
+
+    def edit_expert(self, raw_row_data, record_id, old_key, prefetched=None):
+        """Редактировать эксперта вместе с кодами ГРНТИ (old_key - ключ его строки в таблице)"""
+        try:
+            dialog = ExpertEditDialog(raw_row_data, record_id, self, self.db, prefetched)
+            if dialog.exec():
+                expert_data = dialog.get_expert_data()
+                grnti_codes = dialog.get_grnti_codes()
+
+                row_data, row_key = self.db.update_expert_with_grnti(record_id, expert_data, grnti_codes)
+                self.show_changed_row(old_key, row_data, row_key)
+                self.statusbar.showMessage(f"Эксперт успешно обновлен (ID: {record_id})")
+        except Exception as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось обновить эксперта: {str(e)}")
+            print(f"Ошибка при обновлении: {e}")
+
     def edit_record(self):
         """Редактировать выбранную запись"""
         if not self.current_table:
             QMessageBox.warning(self, "Ошибка", "Сначала выберите таблицу")
             return
 
-        selected_row = self.table_widget.currentRow()
+        selected_row = self.table_view.currentIndex().row()
         if selected_row == -1:
             QMessageBox.warning(self, "Ошибка", "Выберите запись для редактирования")
             return
 
         try:
-            # Получаем СЫРЫЕ данные из базы данных для выбранной строки
-            table_data = self.db.get_table_data(self.current_table)
-            if selected_row >= len(table_data):
+            # Сырые данные и ключ выбранной строки хранятся вместе с ней, перечитывать таблицу не нужно
+            if selected_row >= len(self.page_rows):
                 QMessageBox.warning(self, "Ошибка", "Неверный индекс строки")
                 return
 
-            raw_row_data = table_data[selected_row]
+            raw_row_data = self.page_rows[selected_row]
+            row_key = self.row_keys[selected_row]
             record_id = raw_row_data[0]  # ID записи из сырых данных
 
             # Специальная обработка для таблицы expert
             if self.current_table == "expert":
-                dialog = ExpertEditDialog(raw_row_data, record_id, self, self.db)
-                if dialog.exec():
-                    expert_data = dialog.get_expert_data()
-                    grnti_codes = dialog.get_grnti_codes()
-                    
-                    self.db.update_expert_with_grnti(record_id, expert_data, grnti_codes)
-                    self.show_table(self.current_table)
-                    self.statusbar.showMessage(f"Эксперт успешно обновлен (ID: {record_id})")
+                self.open_expert_dialog(
+                    record_id,
+                    lambda prefetched: self.edit_expert(raw_row_data, record_id, row_key, prefetched)
+                )
             else:
                 # Обычная обработка для других таблиц
-                # Преобразуем данные в строки, обрабатывая даты отдельно
-                row_data = []
+                # Значения показываются в диалоге по типам столбцов
                 columns = self.db.get_columns_names(self.current_table)
-                date_columns = self.date_columns.get(self.current_table, [])
-
-                for i, value in enumerate(raw_row_data):
-                    column_name = columns[i]
-                    # Для таблицы expert пропускаем ID в отображаемых данных
-                    if self.current_table == 'expert' and column_name == 'id':
-                        continue
-
-                    if value is None:
-                        row_data.append("")
-                    elif column_name in date_columns and hasattr(value, 'strftime'):
-                        formatted_date = DateValidator.format_date_for_display(value.strftime('%Y-%m-%d'))
-                        row_data.append(formatted_date if formatted_date else str(value))
-                    else:
-                        row_data.append(str(value))
 
                 display_names = self.column_display_names.get(self.current_table, {})
 
@@ -1573,18 +4416,21 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 dialog = EditDialog(
                     self.current_table,
                     columns,  # Передаем все столбцы (включая ID)
-                    [str(x) if x is not None else "" for x in raw_row_data],  # Все данные включая ID
+                    raw_row_data,  # Все данные включая ID
                     parent=self,
                     display_names=dialog_display_names,
-                    date_columns=date_columns
+                    column_info=self.db.get_column_info(self.current_table)
                 )
 
                 if dialog.exec():
                     data = dialog.get_data()
                     # Для обновления передаем данные без ID
-                    self.db.update_record(self.current_table, record_id, data[1:])
-                    self.show_table(self.current_table)
-                    self.statusbar.showMessage("Запись успешно обновлена")
+                    row_data, new_key = self.db.update_record(self.current_table, row_key, data[1:])
+                    self.show_changed_row(row_key, row_data, new_key)
+                    if row_data is None:
+                        self.statusbar.showMessage("Запись не найдена: ее изменил или удалил другой пользователь")
+                    else:
+                        self.statusbar.showMessage("Запись успешно обновлена")
         except Exception as e:
             QMessageBox.warning(self, "Ошибка", f"Не удалось обновить запись: {str(e)}")
             print(f"Ошибка при редактировании: {e}")
@@ -1595,19 +4441,18 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             QMessageBox.warning(self, "Ошибка", "Сначала выберите таблицу")
             return
 
-        selected_row = self.table_widget.currentRow()
+        selected_row = self.table_view.currentIndex().row()
         if selected_row == -1:
             QMessageBox.warning(self, "Ошибка", "Выберите запись для удаления")
             return
 
         try:
-            # Получаем ID из базы данных, так как в интерфейсе он скрыт
-            table_data = self.db.get_table_data(self.current_table)
-            if selected_row >= len(table_data):
+            # Ключ строки хранится вместе с ней (ID в интерфейсе скрыт)
+            if selected_row >= len(self.row_keys):
                 QMessageBox.warning(self, "Ошибка", "Неверный индекс строки")
                 return
 
-            record_id = table_data[selected_row][0]  # ID из сырых данных
+            row_key = self.row_keys[selected_row]
 
             # Подтверждение удаления
             reply = QMessageBox.question(self, "Подтверждение",
@@ -1615,8 +4460,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                                          QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
 
             if reply == QMessageBox.StandardButton.Yes:
-                self.db.delete_record(self.current_table, record_id)
-                self.show_table(self.current_table)
+                self.db.delete_record(self.current_table, row_key)
+                self.show_changed_row(row_key, None, None)
                 self.statusbar.showMessage("Запись успешно удалена")
         except Exception as e:
             QMessageBox.warning(self, "Ошибка", f"Не удалось удалить запись: {str(e)}")
@@ -1637,43 +4482,26 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         """Обработчик изменения размера окна"""
         super().resizeEvent(event)
 
-        # Небольшая задержка для корректного обновления
-        from PyQt6.QtCore import QTimer
-        QTimer.singleShot(50, self.adaptive_resize_columns)
+        # Серия событий при перетаскивании края окна пересчитывает столбцы один раз
+        if hasattr(self, 'resize_timer'):
+            self.resize_timer.start()
 
     def adaptive_resize_columns(self):
-        """Адаптивное изменение столбцов при resize"""
-        if not hasattr(self, 'table_widget') or self.table_widget.columnCount() == 0:
-            return
-
-        header = self.table_widget.horizontalHeader()
-        table_width = self.table_widget.viewport().width()
-
-        # Сначала подгоняем по содержимому
-        self.table_widget.resizeColumnsToContents()
-
-        # Проверяем общую ширину всех столбцов
-        total_width = sum([self.table_widget.columnWidth(i) for i in range(self.table_widget.columnCount())])
-
-        if total_width < table_width:
-            # Если столбцы уже помещаются - растягиваем их равномерно
-            header.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        else:
-            # Если не помещаются - включаем прокрутку
-            header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        """Адаптивное изменение столбцов при resize (по запомненной ширине, без измерения строк)"""
+        self.setup_adaptive_columns()
 
     # def adjust_table_size(self):
     #     """Корректировка размера таблицы при изменении размера окна"""
-    #     if hasattr(self, 'table_widget') and self.table_widget.isVisible():
+    #     if hasattr(self, 'table_view') and self.table_view.isVisible():
     #         # Обновляем растягивание столбцов
-    #         header = self.table_widget.horizontalHeader()
+    #         header = self.table_view.horizontalHeader()
     #
     #         # Сначала подгоняем по содержимому
-    #         self.table_widget.resizeColumnsToContents()
+    #         self.table_view.resizeColumnsToContents()
     #
     #         # Проверяем, нужно ли растягивать
-    #         total_width = sum([self.table_widget.columnWidth(i) for i in range(self.table_widget.columnCount())])
-    #         table_width = self.table_widget.viewport().width()
+    #         total_width = sum([self.table_view.columnWidth(i) for i in range(self.table_model.columnCount())])
+    #         table_width = self.table_view.viewport().width()
     #
     #         if total_width < table_width:
     #             header.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
@@ -1681,13 +4509,25 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     #             header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
     #
     #         # Принудительное обновление таблицы
-    #         self.table_widget.updateGeometry()
+    #         self.table_view.updateGeometry()
 
     def closeEvent(self, event):
         """Закрытие соединения с базой данных при выходе"""
+        if self._page_task is not None:
+            self._page_task.cancel()
+            self._page_task = None
+        if self._count_task is not None:
+            self._count_task.cancel()
+            self._count_task = None
+        if self.listener:
+            self.listener.close()
+        # Фоновые запросы должны завершиться до закрытия пула соединений
+        QThreadPool.globalInstance().waitForDone()
+        if self.adb:
+            self.adb.close()
         if hasattr(self, 'db'):
-            self.db.connection.close()
-            print("Соединение с базой данных закрыто")
+            self.db.close()
+            print("Соединения с базой данных закрыты")
         event.accept()
 
 
@@ -1867,6 +4707,17 @@ class DateValidator:
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = MainWindow()
+    # Цикл asyncio работает поверх цикла событий Qt (нужны asyncpg и qasync)
+    use_async = USE_ASYNC_DB and asyncpg is not None and qasync is not None
+    if use_async:
+        loop = qasync.QEventLoop(app)
+        asyncio.set_event_loop(loop)
+    window = MainWindow(use_async=use_async)
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    if use_async:
+        app_closed = asyncio.Event()
+        app.aboutToQuit.connect(app_closed.set)
+        with loop:
+            loop.run_until_complete(app_closed.wait())
+    else:
+        sys.exit(app.exec())
\ No newline at end of file
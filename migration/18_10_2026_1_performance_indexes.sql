@@ -0,0 +1,56 @@
+-- Индексы для часто выполняемых запросов приложения
+-- Проверка, что запросы их используют: checks/check_performance_indexes.sql
+-- Первый из скриптов 18_10_2026_*: следующие рассчитывают на первичный ключ expert_grnti.
+
+-- expert_grnti: составной первичный ключ (id, rubric).
+-- Его индекс обслуживает соединение с expert в общей таблице,
+-- чтение кодов эксперта и DELETE FROM expert_grnti WHERE id = ...
+-- Строки, которым ключ не подходит (коды без эксперта, повторы рубрики у эксперта - возможно,
+-- с разными подрубриками), миграция не удаляет: она прерывается со списком таких строк,
+-- их нужно исправить или удалить вручную и выполнить скрипт заново
+DO $$
+DECLARE
+    conflicts TEXT;
+    conflict_count INTEGER;
+BEGIN
+    SELECT count(*), string_agg(format('id=%s rubric=%s subrubric=%s siscipline=%s',
+                                       coalesce(id::text, 'NULL'), rubric,
+                                       coalesce(subrubric::text, 'NULL'), coalesce(siscipline::text, 'NULL')),
+                                E'\n' ORDER BY id, rubric, subrubric, siscipline)
+    INTO conflict_count, conflicts
+    FROM (
+        SELECT id, rubric, subrubric, siscipline,
+               id IS NULL OR count(*) OVER (PARTITION BY id, rubric) > 1 AS conflicting
+        FROM expert_grnti
+    ) rows
+    WHERE conflicting;
+
+    IF conflict_count > 0 THEN
+        RAISE EXCEPTION 'expert_grnti: % строк мешают первичному ключу (id, rubric)', conflict_count
+            USING DETAIL = conflicts,
+                  HINT = 'Заполните id или оставьте у эксперта одну строку на рубрику и повторите миграцию';
+    END IF;
+END
+$$;
+
+ALTER TABLE expert_grnti
+    ALTER COLUMN id SET NOT NULL,
+    ADD CONSTRAINT expert_grnti_pkey PRIMARY KEY (id, rubric);
+
+-- Поиск по подстроке (ILIKE '%...%') через триграммы
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX reg_obl_city_city_trgm_idx ON reg_obl_city USING gin (city gin_trgm_ops);
+CREATE INDEX expert_name_trgm_idx ON expert USING gin (name gin_trgm_ops);
+
+-- Города региона в алфавитном порядке (выбор города в карточке эксперта)
+CREATE INDEX reg_obl_city_region_city_idx ON reg_obl_city (region, city);
+
+-- Сортировка экспертов по ФИО: общая таблица (ORDER BY e.name)
+-- и постраничный просмотр, где текст сравнивается без учета регистра
+CREATE INDEX expert_name_idx ON expert (name);
+CREATE INDEX expert_lower_name_idx ON expert (lower(name), id);
+
+ANALYZE expert;
+ANALYZE expert_grnti;
+ANALYZE reg_obl_city;
@@ -0,0 +1,157 @@
+-- Общая таблица (эксперты + коды ГРНТИ + описания рубрик), хранимая готовой.
+-- Выполняется после 18_10_2026_1_performance_indexes.sql: строка определяется
+-- экспертом и рубрикой, что гарантирует первичный ключ expert_grnti (id, rubric).
+-- Триггеры на исходных таблицах пересчитывают только строки затронутых экспертов;
+-- заново общая таблица строится лишь после TRUNCATE исходной таблицы.
+
+CREATE TABLE expert_combined (
+    expert_id         INTEGER NOT NULL,
+    expert_name       VARCHAR(50),
+    region            VARCHAR(50),
+    city              VARCHAR(50),
+    input_date        DATE,
+    grnti_code        SMALLINT,
+    grnti_description VARCHAR(100),
+    subrubric         SMALLINT,
+    siscipline        SMALLINT
+);
+
+-- Ключ строки (у эксперта без кодов ГРНТИ рубрики нет)
+CREATE UNIQUE INDEX expert_combined_key_idx ON expert_combined (expert_id, COALESCE(grnti_code, -1));
+-- Порядок по умолчанию: ФИО без учета регистра, затем ключ строки
+CREATE INDEX expert_combined_name_idx ON expert_combined (lower(expert_name), expert_id, COALESCE(grnti_code, -1));
+-- Обновление описаний при изменении классификатора
+CREATE INDEX expert_combined_grnti_code_idx ON expert_combined (grnti_code);
+
+-- Пересчитывает строки общей таблицы для указанных экспертов.
+-- Транзакции, изменяющие одного эксперта (например, ФИО в одной и коды в другой), не блокируют
+-- друг друга на исходных таблицах, поэтому пересчет эксперта сначала ждет блокировку эксперта
+-- (по возрастанию id - без взаимных блокировок). Следующий оператор видит строки, которые
+-- вставила зафиксированная к этому моменту транзакция, и удаляет их, а не дублирует
+CREATE FUNCTION expert_combined_refresh(expert_ids INTEGER[]) RETURNS void AS $$
+    SELECT pg_advisory_xact_lock(hashtext('expert_combined'), id)
+    FROM (SELECT DISTINCT unnest(expert_ids) AS id ORDER BY 1) ids;
+
+    DELETE FROM expert_combined WHERE expert_id = ANY(expert_ids);
+
+    INSERT INTO expert_combined
+    SELECT e.id, e.name, e.region, e.city, e.input_date,
+           eg.rubric, gc.description, eg.subrubric, eg.siscipline
+    FROM expert e
+    LEFT JOIN expert_grnti eg ON e.id = eg.id
+    LEFT JOIN grnti_classifier gc ON eg.rubric = gc.codrub
+    WHERE e.id = ANY(expert_ids);
+$$ LANGUAGE sql;
+
+-- Изменения expert и expert_grnti: эксперты берутся из столбца id измененных строк.
+-- Триггеры уровня оператора: импорт тысяч строк пересчитывает каждого эксперта один раз
+CREATE FUNCTION expert_combined_rows_changed() RETURNS trigger AS $$
+DECLARE
+    expert_ids INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT id) INTO expert_ids FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT id) INTO expert_ids FROM old_rows;
+    ELSE
+        SELECT array_agg(id) INTO expert_ids
+        FROM (SELECT id FROM old_rows UNION SELECT id FROM new_rows) changed;
+    END IF;
+
+    IF expert_ids IS NOT NULL THEN
+        PERFORM expert_combined_refresh(expert_ids);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Изменения классификатора меняют только описания рубрик
+CREATE FUNCTION expert_combined_classifier_changed() RETURNS trigger AS $$
+DECLARE
+    codes SMALLINT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(codrub) INTO codes FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(codrub) INTO codes FROM old_rows;
+    ELSE
+        SELECT array_agg(codrub) INTO codes
+        FROM (SELECT codrub FROM old_rows UNION SELECT codrub FROM new_rows) changed;
+    END IF;
+
+    UPDATE expert_combined c
+    SET grnti_description = (SELECT gc.description FROM grnti_classifier gc WHERE gc.codrub = c.grnti_code)
+    WHERE c.grnti_code = ANY(codes);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Очистка исходной таблицы (TRUNCATE, в том числе каскадная): строк переходов нет,
+-- общая таблица строится заново
+CREATE FUNCTION expert_combined_rebuild() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM expert_combined;
+    INSERT INTO expert_combined
+    SELECT e.id, e.name, e.region, e.city, e.input_date,
+           eg.rubric, gc.description, eg.subrubric, eg.siscipline
+    FROM expert e
+    LEFT JOIN expert_grnti eg ON e.id = eg.id
+    LEFT JOIN grnti_classifier gc ON eg.rubric = gc.codrub;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Очистка классификатора: у всех рубрик пропадают описания
+CREATE FUNCTION expert_combined_classifier_truncated() RETURNS trigger AS $$
+BEGIN
+    UPDATE expert_combined SET grnti_description = NULL WHERE grnti_description IS NOT NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Таблицы переходов (REFERENCING) допускаются только у триггеров с одним событием
+CREATE TRIGGER expert_combined_insert AFTER INSERT ON expert
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_rows_changed();
+CREATE TRIGGER expert_combined_update AFTER UPDATE ON expert
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_rows_changed();
+CREATE TRIGGER expert_combined_delete AFTER DELETE ON expert
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_rows_changed();
+CREATE TRIGGER expert_combined_truncate AFTER TRUNCATE ON expert
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_rebuild();
+
+CREATE TRIGGER expert_combined_insert AFTER INSERT ON expert_grnti
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_rows_changed();
+CREATE TRIGGER expert_combined_update AFTER UPDATE ON expert_grnti
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_rows_changed();
+CREATE TRIGGER expert_combined_delete AFTER DELETE ON expert_grnti
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_rows_changed();
+CREATE TRIGGER expert_combined_truncate AFTER TRUNCATE ON expert_grnti
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_rebuild();
+
+CREATE TRIGGER expert_combined_insert AFTER INSERT ON grnti_classifier
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_classifier_changed();
+CREATE TRIGGER expert_combined_update AFTER UPDATE ON grnti_classifier
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_classifier_changed();
+CREATE TRIGGER expert_combined_delete AFTER DELETE ON grnti_classifier
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_classifier_changed();
+CREATE TRIGGER expert_combined_truncate AFTER TRUNCATE ON grnti_classifier
+    FOR EACH STATEMENT EXECUTE FUNCTION expert_combined_classifier_truncated();
+
+-- Начальное заполнение
+INSERT INTO expert_combined
+SELECT e.id, e.name, e.region, e.city, e.input_date,
+       eg.rubric, gc.description, eg.subrubric, eg.siscipline
+FROM expert e
+LEFT JOIN expert_grnti eg ON e.id = eg.id
+LEFT JOIN grnti_classifier gc ON eg.rubric = gc.codrub;
+
+ANALYZE expert_combined;
@@ -0,0 +1,60 @@
+-- Счетчики версий таблиц для кэша результатов в приложении.
+-- Версия таблицы - число зафиксированных транзакций, которые ее изменили; кэш проверяет
+-- актуальность одним запросом вместо повторного чтения данных.
+-- Изменяющая транзакция только добавляет свою строку в table_change и не трогает общих
+-- строк: общий счетчик блокировался бы до фиксации, и долгий импорт останавливал бы
+-- сохранения остальных операторов.
+-- Выполняется после 18_10_2026_2_expert_combined.sql.
+
+-- Изменения, уже перенесенные из table_change функцией table_version_collapse
+CREATE TABLE table_version (
+    table_name TEXT PRIMARY KEY,
+    version    BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO table_version (table_name)
+VALUES ('expert'), ('expert_grnti'), ('grnti_classifier'), ('reg_obl_city'), ('expert_combined');
+
+-- Еще не перенесенные изменения: строка на таблицу и транзакцию
+CREATE TABLE table_change (
+    table_name TEXT NOT NULL,
+    xact_id    BIGINT NOT NULL,
+    PRIMARY KEY (table_name, xact_id)
+);
+
+-- Один раз на транзакцию: импорт тысяч строк увеличивает версию на единицу.
+-- Ключ содержит номер транзакции, поэтому вставки разных транзакций не ждут друг друга
+CREATE FUNCTION table_version_bump() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_change (table_name, xact_id)
+    VALUES (TG_TABLE_NAME, txid_current())
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Переносит зафиксированные изменения в table_version, чтобы table_change не росла
+-- (приложение вызывает ее при запуске; можно выполнять и по расписанию).
+-- Версия - сумма table_version.version и строк table_change - при этом не меняется.
+-- Незафиксированные строки не видны и не удаляются: изменяющие транзакции не ждут
+CREATE FUNCTION table_version_collapse() RETURNS void AS $$
+    WITH moved AS (
+        DELETE FROM table_change RETURNING table_name
+    )
+    UPDATE table_version v
+    SET version = v.version + m.changes
+    FROM (SELECT table_name, count(*) AS changes FROM moved GROUP BY table_name) m
+    WHERE v.table_name = m.table_name;
+$$ LANGUAGE sql;
+
+CREATE TRIGGER table_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON expert
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+CREATE TRIGGER table_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON expert_grnti
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+CREATE TRIGGER table_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON grnti_classifier
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+CREATE TRIGGER table_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON reg_obl_city
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
+-- Общую таблицу изменяют триггеры исходных таблиц; их операторы тоже увеличивают версию
+CREATE TRIGGER table_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON expert_combined
+    FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump();
@@ -0,0 +1,95 @@
+-- Уведомления об изменении таблиц для открытых окон приложения (LISTEN table_changed).
+-- Полезная нагрузка: {"table": ..., "op": "INSERT" | "UPDATE" | "DELETE" | "TRUNCATE", "keys": [...]}
+-- keys - значения ключевого столбца измененных строк (аргумент триггера) или, если столбцов
+-- несколько, массивы их значений; null, если строк слишком много для одного уведомления.
+-- Уведомления отправляются при фиксации транзакции.
+-- Выполняется после 18_10_2026_3_table_versions.sql.
+
+CREATE FUNCTION notify_table_changed() RETURNS trigger AS $$
+DECLARE
+    key_expr TEXT;
+    keys JSON;
+    payload TEXT;
+BEGIN
+    IF TG_NARGS = 1 THEN
+        key_expr := format('%I', TG_ARGV[0]);
+    ELSIF TG_NARGS > 1 THEN
+        -- jsonb, а не json: у json нет сравнения для DISTINCT и UNION
+        SELECT format('jsonb_build_array(%s)', string_agg(format('%I', column_name), ', '))
+        INTO key_expr FROM unnest(TG_ARGV) column_name;
+    END IF;
+
+    IF key_expr IS NOT NULL THEN
+        IF TG_OP = 'INSERT' THEN
+            EXECUTE format('SELECT json_agg(DISTINCT %s) FROM new_rows', key_expr) INTO keys;
+        ELSIF TG_OP = 'DELETE' THEN
+            EXECUTE format('SELECT json_agg(DISTINCT %s) FROM old_rows', key_expr) INTO keys;
+        ELSIF TG_OP = 'UPDATE' THEN
+            EXECUTE format('SELECT json_agg(key) FROM (SELECT %1$s AS key FROM old_rows '
+                           'UNION SELECT %1$s FROM new_rows) changed', key_expr) INTO keys;
+        END IF;
+        IF keys IS NULL AND TG_OP <> 'TRUNCATE' THEN
+            RETURN NULL;  -- оператор не изменил ни одной строки
+        END IF;
+    END IF;
+
+    payload := json_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'keys', keys)::text;
+    -- Размер уведомления ограничен (8000 байт): при массовых изменениях ключи не передаются
+    IF octet_length(payload) > 7500 THEN
+        payload := json_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'keys', NULL)::text;
+    END IF;
+    PERFORM pg_notify('table_changed', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Таблицы переходов (REFERENCING) допускаются только у триггеров с одним событием
+CREATE TRIGGER notify_insert AFTER INSERT ON expert
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('id');
+CREATE TRIGGER notify_update AFTER UPDATE ON expert
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('id');
+CREATE TRIGGER notify_delete AFTER DELETE ON expert
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('id');
+CREATE TRIGGER notify_truncate AFTER TRUNCATE ON expert
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed();
+
+-- Для кодов ГРНТИ передаются идентификаторы экспертов
+CREATE TRIGGER notify_insert AFTER INSERT ON expert_grnti
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('id');
+CREATE TRIGGER notify_update AFTER UPDATE ON expert_grnti
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('id');
+CREATE TRIGGER notify_delete AFTER DELETE ON expert_grnti
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('id');
+CREATE TRIGGER notify_truncate AFTER TRUNCATE ON expert_grnti
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed();
+
+CREATE TRIGGER notify_insert AFTER INSERT ON grnti_classifier
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('codrub');
+CREATE TRIGGER notify_update AFTER UPDATE ON grnti_classifier
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('codrub');
+CREATE TRIGGER notify_delete AFTER DELETE ON grnti_classifier
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('codrub');
+CREATE TRIGGER notify_truncate AFTER TRUNCATE ON grnti_classifier
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed();
+
+-- У reg_obl_city нет ключа: измененные строки указываются парами (регион, город)
+CREATE TRIGGER notify_insert AFTER INSERT ON reg_obl_city
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('region', 'city');
+CREATE TRIGGER notify_update AFTER UPDATE ON reg_obl_city
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('region', 'city');
+CREATE TRIGGER notify_delete AFTER DELETE ON reg_obl_city
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed('region', 'city');
+CREATE TRIGGER notify_truncate AFTER TRUNCATE ON reg_obl_city
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed();